@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from .scraper_state import pop_unsent_alerts, mark_alert_sent
 from .config import settings
@@ -6,19 +5,14 @@ from .db import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
-async def alert_loop(bot_app):
-    """Background task to send unsent alerts to admin via the bot."""
+async def send_pending_alerts(bot_app):
+    """One alert job run: send unsent alerts to admin via the bot."""
     admin = settings.ADMIN_USERNAME.lstrip('@')
-    while True:
+    rows = await pop_unsent_alerts()
+    for r in rows:
         try:
-            rows = await pop_unsent_alerts()
-            for r in rows:
-                try:
-                    # bot_app assumed to be the Telegram application from build_and_run_bot
-                    await bot_app.bot.send_message(admin, f"[ALERT] {r.message}")
-                    await mark_alert_sent(r.id)
-                except Exception:
-                    logger.exception("Failed to send admin alert for %s", r.id)
+            # bot_app assumed to be the Telegram application from build_and_run_bot
+            await bot_app.bot.send_message(admin, f"[ALERT] {r.message}")
+            await mark_alert_sent(r.id)
         except Exception:
-            logger.exception("Error in alert_loop")
-        await asyncio.sleep(settings.COLLECTION_INTERVAL)
+            logger.exception("Failed to send admin alert for %s", r.id)
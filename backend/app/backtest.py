@@ -0,0 +1,343 @@
+import hashlib
+import itertools
+import json
+import logging
+import random
+import time
+from typing import Dict, Any, Optional, List, Callable, Tuple, AsyncIterator
+import numpy as np
+from sqlalchemy import select, and_, or_
+from .db import Observation
+
+logger = logging.getLogger(__name__)
+
+# confidence calibration bins: [0,10), [10,20) ... [90,100]
+CALIBRATION_BINS = 10
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+class Batch:
+    """Labeled observations of one site as column arrays (one entry per observation).
+
+    Odds lists are reduced to the same per-row features the predictors use
+    (count, mean, std, min, max), so strategies only do whole-array NumPy operations.
+    """
+
+    FIELDS = ('ts', 'count', 'mean', 'std', 'min', 'max', 'actual')
+
+    def __init__(self, site: Optional[str], ts, count, mean, std, mn, mx, actual):
+        self.site = site
+        self.ts = ts
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.min = mn
+        self.max = mx
+        self.actual = actual
+
+    def __len__(self):
+        return len(self.ts)
+
+    def slice(self, start: int, stop: int) -> 'Batch':
+        return Batch(self.site, *(getattr(self, f)[start:stop] for f in self.FIELDS))
+
+    @classmethod
+    def concat(cls, site: Optional[str], batches: List['Batch']) -> 'Batch':
+        return cls(site, *(np.concatenate([getattr(b, f) for b in batches]) for f in cls.FIELDS))
+
+    @classmethod
+    def from_rows(cls, site: Optional[str], rows) -> 'Batch':
+        """Build a batch from (ts, odds_json, multiplier) rows; unparsable rows are dropped."""
+        ts, odds, actual = [], [], []
+        for r_ts, r_odds, r_mult in rows:
+            try:
+                lst = [float(o) for o in json.loads(r_odds)] if r_odds else []
+                m = float(r_mult)
+            except (ValueError, TypeError):
+                continue
+            ts.append(r_ts)
+            odds.append(lst)
+            actual.append(m)
+        counts = np.fromiter(map(len, odds), dtype=np.int64, count=len(odds))
+        flat = np.fromiter(itertools.chain.from_iterable(odds), dtype=float, count=int(counts.sum()))
+        n = len(counts)
+        mean = np.zeros(n)
+        std = np.zeros(n)
+        mn = np.zeros(n)
+        mx = np.zeros(n)
+        nonempty = counts > 0
+        if flat.size:
+            # rows without odds add no elements, so the offsets of non-empty rows are increasing
+            offsets = (np.cumsum(counts) - counts)[nonempty]
+            c = counts[nonempty]
+            mean[nonempty] = np.add.reduceat(flat, offsets) / c
+            sq = np.add.reduceat(flat * flat, offsets) / c
+            std[nonempty] = np.sqrt(np.maximum(sq - mean[nonempty] ** 2, 0.0))
+            mn[nonempty] = np.minimum.reduceat(flat, offsets)
+            mx[nonempty] = np.maximum.reduceat(flat, offsets)
+        return cls(site, np.array(ts, dtype=np.int64), counts, mean, std, mn, mx, np.array(actual, dtype=float))
+
+
+# ---- strategies -------------------------------------------------------------------------
+# A strategy maps a Batch to (predicted odds, confidence) arrays. `state` is a dict private
+# to the strategy for one backtest run (e.g. to cache a loaded model).
+Strategy = Callable[[Batch, Dict[str, Any]], Tuple[np.ndarray, np.ndarray]]
+STRATEGIES: Dict[str, Strategy] = {}
+# strategies that need Python work per distinct input (reported so rows/sec is read correctly)
+NOT_VECTORIZED = set()
+
+
+def register_strategy(name: str, vectorized: bool = True):
+    """Decorator registering a backtest strategy under a name."""
+    def decorator(fn):
+        STRATEGIES[name] = fn
+        if not vectorized:
+            NOT_VECTORIZED.add(name)
+        return fn
+    return decorator
+
+
+def _seeded_draws(site: Optional[str], ts: np.ndarray, draws: int, cache: Dict[Any, List[float]]) -> np.ndarray:
+    """First `draws` random.Random values seeded like predictor._seed_from_site at each row's minute.
+
+    SHA-256 seeding and the Mersenne Twister have no NumPy equivalent, so each distinct
+    (site, minute) costs one Python iteration; `cache` (the strategy state) keeps the draws
+    for the whole run so no minute is seeded twice.
+    """
+    minutes, inverse = np.unique(ts // 60, return_inverse=True)
+    rows = []
+    for minute in minutes.tolist():
+        key = (site, minute)
+        if key not in cache:
+            rnd = random.Random(int(hashlib.sha256(((site or "") + str(minute)).encode()).hexdigest(), 16) % (2 ** 32))
+            cache[key] = [rnd.random() for _ in range(draws)]
+        rows.append(cache[key])
+    return np.array(rows, dtype=float).reshape(len(minutes), draws)[inverse.reshape(-1)]
+
+
+def _heuristic_arrays(batch: Batch, state: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """predictor._heuristic_from_odds over a whole batch."""
+    spread = batch.max - batch.min
+    conf = np.clip(np.trunc(50 + np.sqrt(batch.count) * 5 - spread), 40, 95)
+    odds = np.round(batch.mean, 2)
+    empty = batch.count == 0
+    if empty.any():
+        # rows without odds fall back to the seeded draw, like the predictor
+        r = _seeded_draws(None, batch.ts[empty], 1, state.setdefault('draws1', {}))[:, 0]
+        odds[empty] = np.round(1.05 + r * 2.0, 2)
+        conf[empty] = 35
+    return odds, conf
+
+
+@register_strategy('heuristic')
+def heuristic_strategy(batch: Batch, state: Dict[str, Any]):
+    return _heuristic_arrays(batch, state)
+
+
+@register_strategy('seeded', vectorized=False)
+def seeded_strategy(batch: Batch, state: Dict[str, Any]):
+    """predictor.predict: pseudo-random odds seeded by site and minute (one seed per distinct minute)."""
+    r = _seeded_draws(batch.site, batch.ts, 2, state.setdefault('draws2', {}))
+    return np.round(1.01 + r[:, 0] * 4.0, 2), np.trunc(40 + r[:, 1] * 60)
+
+
+@register_strategy('model')
+def model_strategy(batch: Batch, state: Dict[str, Any]):
+    """The trained model path of model_predict (heuristic fallback for rows without odds)."""
+    models = state.setdefault('models', {})
+    if batch.site not in models:
+        from .model import load_site_model
+        models[batch.site] = load_site_model(batch.site)
+    model = models[batch.site]
+    if model is None:
+        raise RuntimeError("no trained model (run scripts/train_model.py)")
+    odds, conf = _heuristic_arrays(batch, state)
+    has_odds = batch.count > 0
+    if has_odds.any():
+        X = np.column_stack([batch.mean, batch.std, batch.min, batch.max, batch.count])[has_odds]
+        odds[has_odds] = np.round(model.predict(X), 2)
+        conf[has_odds] = np.clip(40 + batch.count[has_odds] * 5, 45, 95)
+    return odds, conf
+
+
+# ---- metrics ----------------------------------------------------------------------------
+
+class Metrics:
+    """Streaming error and calibration accumulator (sums only, so windows can be merged)."""
+
+    def __init__(self):
+        self.n = 0
+        self.abs_err = 0.0
+        self.sq_err = 0.0
+        self.err = 0.0
+        self.hits = 0
+        self.bin_n = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.bin_conf = np.zeros(CALIBRATION_BINS)
+        self.bin_hits = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.seconds = 0.0
+
+    def add(self, pred: np.ndarray, conf: np.ndarray, actual: np.ndarray):
+        err = pred - actual
+        # a signal "hits" when the round reached the predicted odds before crashing
+        hit = actual >= pred
+        bins = np.clip((conf // (100 // CALIBRATION_BINS)).astype(np.int64), 0, CALIBRATION_BINS - 1)
+        self.n += len(actual)
+        self.abs_err += float(np.abs(err).sum())
+        self.sq_err += float((err * err).sum())
+        self.err += float(err.sum())
+        self.hits += int(hit.sum())
+        self.bin_n += np.bincount(bins, minlength=CALIBRATION_BINS)
+        self.bin_conf += np.bincount(bins, weights=conf, minlength=CALIBRATION_BINS)
+        self.bin_hits += np.bincount(bins, weights=hit, minlength=CALIBRATION_BINS).astype(np.int64)
+
+    def report(self) -> Dict[str, Any]:
+        if not self.n:
+            return {'n': 0}
+        calibration = []
+        ece = 0.0
+        for b in range(CALIBRATION_BINS):
+            n = int(self.bin_n[b])
+            if not n:
+                continue
+            mean_conf = self.bin_conf[b] / n / 100.0
+            hit_rate = self.bin_hits[b] / n
+            ece += n / self.n * abs(hit_rate - mean_conf)
+            calibration.append({
+                'confidence': f"{b * 10}-{b * 10 + 10}",
+                'n': n,
+                'mean_confidence': round(float(mean_conf), 3),
+                'hit_rate': round(float(hit_rate), 3),
+            })
+        return {
+            'n': self.n,
+            'mae': round(self.abs_err / self.n, 4),
+            'rmse': round((self.sq_err / self.n) ** 0.5, 4),
+            'bias': round(self.err / self.n, 4),
+            'hit_rate': round(self.hits / self.n, 4),
+            'calibration_error': round(float(ece), 4),
+            'calibration': calibration,
+            'rows_per_sec': round(self.n / self.seconds, 1) if self.seconds else None,
+        }
+
+
+# ---- engine -----------------------------------------------------------------------------
+
+async def iter_site_batches(site: Optional[str], engine=None, since: Optional[int] = None, until: Optional[int] = None,
+                            page_size: int = 5000) -> AsyncIterator[Batch]:
+    """Stream a site's labeled observations in (ts, id) order, one keyset page per batch."""
+    engine = _get_engine(engine)
+    obs = Observation.__table__
+    cond = [obs.c.site.is_(None) if site is None else obs.c.site == site, obs.c.multiplier.isnot(None)]
+    if since is not None:
+        cond.append(obs.c.ts >= since)
+    if until is not None:
+        cond.append(obs.c.ts < until)
+    last = None
+    async with engine.connect() as conn:
+        while True:
+            q = select(obs.c.id, obs.c.ts, obs.c.odds, obs.c.multiplier).where(*cond)
+            if last is not None:
+                q = q.where(or_(obs.c.ts > last[0], and_(obs.c.ts == last[0], obs.c.id > last[1])))
+            page = (await conn.execute(q.order_by(obs.c.ts, obs.c.id).limit(page_size))).all()
+            if not page:
+                break
+            last = (page[-1].ts, page[-1].id)
+            yield Batch.from_rows(site, [(r.ts, r.odds, r.multiplier) for r in page])
+
+
+async def labeled_sites(engine=None) -> List[Optional[str]]:
+    obs = Observation.__table__
+    async with _get_engine(engine).connect() as conn:
+        rows = await conn.execute(select(obs.c.site).where(obs.c.multiplier.isnot(None)).distinct())
+        return [r[0] for r in rows]
+
+
+def _replay(window: Batch, strategies: Dict[str, Strategy], states, totals, per_site, failed) -> Dict[str, Any]:
+    out = {}
+    for name, fn in strategies.items():
+        if name in failed:
+            continue
+        t0 = time.perf_counter()
+        try:
+            pred, conf = fn(window, states[name])
+        except Exception as e:
+            failed[name] = repr(e)
+            logger.warning("Backtest strategy %s failed: %r", name, e)
+            continue
+        pred = np.asarray(pred, dtype=float)
+        conf = np.asarray(conf, dtype=float)
+        elapsed = time.perf_counter() - t0
+        for m in (totals[name], per_site[name]):
+            m.add(pred, conf, window.actual)
+            m.seconds += elapsed
+        out[name] = round(float(np.abs(pred - window.actual).mean()), 4)
+    return out
+
+
+async def run_backtest(strategies: Optional[List[str]] = None, sites: Optional[List[str]] = None,
+                       since: Optional[int] = None, until: Optional[int] = None, window: int = 86400,
+                       engine=None, page_size: int = 5000, keep_windows: bool = False) -> Dict[str, Any]:
+    """Replay registered strategies over each site's history, one rolling time window at a time.
+
+    Windows are aligned to multiples of `window` seconds. Rows are streamed page by page and a
+    window is replayed as soon as a later timestamp shows it is complete, so memory stays
+    bounded by one window plus one page.
+    """
+    names = strategies or list(STRATEGIES)
+    unknown = [n for n in names if n not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+    selected = {n: STRATEGIES[n] for n in names}
+    states: Dict[str, Dict[str, Any]] = {n: {} for n in names}
+    totals = {n: Metrics() for n in names}
+    failed: Dict[str, str] = {}
+    site_reports: Dict[str, Any] = {}
+    windows: List[Dict[str, Any]] = []
+    rows = 0
+    t0 = time.perf_counter()
+    for site in (sites if sites is not None else await labeled_sites(engine)):
+        per_site = {n: Metrics() for n in names}
+        pending: List[Batch] = []
+
+        def flush(buf: Batch):
+            # replay every complete window in buf (all of it at the end of the stream)
+            start = 0
+            while start < len(buf):
+                w_start = int(buf.ts[start] // window * window)
+                stop = int(np.searchsorted(buf.ts, w_start + window, side='left'))
+                maes = _replay(buf.slice(start, stop), selected, states, totals, per_site, failed)
+                if keep_windows:
+                    windows.append({'site': site, 'start': w_start, 'n': stop - start, 'mae': maes})
+                start = stop
+
+        async for page in iter_site_batches(site, engine, since, until, page_size):
+            rows += len(page)
+            pending.append(page)
+            buf = Batch.concat(site, pending)
+            # everything before the window holding the newest row is complete
+            cut = int(np.searchsorted(buf.ts, buf.ts[-1] // window * window, side='left'))
+            if cut:
+                flush(buf.slice(0, cut))
+            pending = [buf.slice(cut, len(buf))]
+        if pending and sum(len(b) for b in pending):
+            flush(Batch.concat(site, pending))
+        site_reports[site or 'global'] = {n: m.report() for n, m in per_site.items() if m.n}
+    elapsed = time.perf_counter() - t0
+    report = {
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+        'window': window,
+        'strategies': {n: dict(m.report(), vectorized=n not in NOT_VECTORIZED) for n, m in totals.items()},
+        'sites': site_reports,
+        'failed': failed,
+    }
+    if keep_windows:
+        report['windows'] = windows
+    return report
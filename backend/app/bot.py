@@ -7,8 +7,12 @@ from .i18n import t
 from .db import AsyncSessionLocal, User, Observation
 from .telethon_auth import start_sign_in, complete_sign_in, complete_twofactor
 from . import predictor
+from . import subscriptions
+from .site_stats import site_stats
+from .update_processing import ChatOrderedApplication
+from .supervisor import Supervisor
+from .leader import LeaderElector
 from sqlalchemy import select
-import asyncio
 from sqlalchemy import update
 
 # Supported betting sites (initial list; expand over time)
@@ -76,9 +80,9 @@ async def site_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     site = data.split(':', 1)[1]
     lang = 'fr' if (query.from_user and query.from_user.language_code and query.from_user.language_code.startswith('fr')) else 'en'
-    # Call predictor for selected site
+    # Call predictor for selected site (served from the odds snapshot cache)
     try:
-        p = predictor.predict(site)
+        p = await predictor.model_predict(site)
         await query.edit_message_text(t(lang, 'predict_result', site=p['site'], odds=p['odds'], confidence=p['confidence']))
     except Exception as e:
         await query.edit_message_text(t(lang, 'error', msg=str(e)))
@@ -88,7 +92,7 @@ async def predict_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang = 'fr' if (update.effective_user and update.effective_user.language_code and update.effective_user.language_code.startswith('fr')) else 'en'
     site = ' '.join(context.args) if context.args else None
     try:
-        p = predictor.predict(site)
+        p = await predictor.model_predict(site)
         await update.message.reply_text(t(lang, 'predict_result', site=p['site'], odds=p['odds'], confidence=p['confidence']))
     except Exception as e:
         await update.message.reply_text(t(lang, 'error', msg=str(e)))
@@ -96,13 +100,16 @@ async def predict_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang = 'fr' if (update.effective_user and update.effective_user.language_code and update.effective_user.language_code.startswith('fr')) else 'en'
     user_id = update.effective_user.id
-    preferred_sites = ' '.join(context.args) if context.args else None
+    sites = subscriptions.parse_sites(' '.join(context.args)) if context.args else []
+    preferred_sites = ','.join(sites) if sites else None
     async with AsyncSessionLocal() as session:
         result = (await session.execute(select(User).filter_by(telegram_id=user_id))).scalars().first()
         if not result:
             user = User(telegram_id=user_id, subscribed=True, language=lang, preferred_sites=preferred_sites)
             session.add(user)
+            await subscriptions.set_user_sites(session, user_id, sites)
             await session.commit()
+            subscriptions.index_user(user_id, lang, sites, digest=True)
             await update.message.reply_text(t(lang, 'subscribed'))
             return
         if result.subscribed:
@@ -111,8 +118,10 @@ async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         result.subscribed = True
         if preferred_sites:
             result.preferred_sites = preferred_sites
+            await subscriptions.set_user_sites(session, user_id, sites)
         result.language = lang
         await session.commit()
+        subscriptions.index_user(user_id, lang, subscriptions.parse_sites(result.preferred_sites), digest=result.digest)
         await update.message.reply_text(t(lang, 'subscribed'))
 
 async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -125,48 +134,134 @@ async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             return
         result.subscribed = False
         await session.commit()
+        subscriptions.unindex_user(user_id)
         await update.message.reply_text(t(lang, 'unsubscribed'))
 
-async def _send_prediction_to_user(bot, user: User, prediction: dict):
+async def _send_prediction_to_user(bot, chat_id: int, lang: str, prediction: dict):
     try:
-        msg = t(user.language or settings.DEFAULT_LANG, 'signal_alert', site=prediction['site'], odds=prediction['odds'], confidence=prediction['confidence'])
-        await bot.send_message(user.telegram_id, msg)
+        msg = t(lang or settings.DEFAULT_LANG, 'signal_alert', site=prediction['site'], odds=prediction['odds'], confidence=prediction['confidence'])
+        await bot.send_message(chat_id, msg)
     except Exception as e:
-        logger.exception("Failed to send signal to %s: %s", user.telegram_id, e)
+        logger.exception("Failed to send signal to %s: %s", chat_id, e)
 
-async def signal_dispatcher(app):
-    """Background task that periodically computes predictions and sends to subscribed users."""
-    bot = app.bot
-    interval = settings.PREDICTION_INTERVAL
-    while True:
-        try:
-            # Compute some predictions (global or for specific sites)
-            preds = await predictor.batch_predict() if hasattr(predictor, 'batch_predict') else [predictor.predict(None)]
-            async with AsyncSessionLocal() as session:
-                rows = (await session.execute(select(User).filter_by(subscribed=True))).scalars().all()
-                for user in rows:
-                    if user.preferred_sites:
-                        sites = [s.strip() for s in user.preferred_sites.split(',') if s.strip()]
-                        for s in sites:
-                            try:
-                                p = await predictor.model_predict(s) if hasattr(predictor, 'model_predict') else predictor.predict(s)
-                                await _send_prediction_to_user(bot, user, p)
-                            except Exception:
-                                logger.exception("Failed to compute/send prediction for %s to %s", s, user.telegram_id)
-                    else:
-                        for p in preds:
-                            await _send_prediction_to_user(bot, user, p)
-        except Exception as e:
-            logger.exception("Error in signal_dispatcher: %s", e)
+async def _send_digest_to_user(bot, chat_id: int, lang: str, predictions: list):
+    lang = lang or settings.DEFAULT_LANG
+    try:
+        lines = '\n'.join(t(lang, 'signal_digest_line', site=p['site'], odds=p['odds'], confidence=p['confidence']) for p in predictions)
+        await bot.send_message(chat_id, t(lang, 'signal_digest', count=len(predictions), lines=lines))
+    except Exception as e:
+        logger.exception("Failed to send signal digest to %s: %s", chat_id, e)
+
+# per-tick delivery counters (exposed on /metrics)
+DISPATCH_STATS = {'ticks': 0, 'messages_sent': 0, 'predictions_delivered': 0, 'api_calls_saved': 0, 'last_tick_saved': 0}
+
+async def dispatch_signals(bot):
+    """One dispatcher tick: one prediction per subscribed site, grouped per recipient.
+
+    Users with digest enabled get all of their predictions in a single message.
+    """
+    # copy the index so /subscribe during a tick does not mutate what we iterate
+    by_site = {s: set(ids) for s, ids in subscriptions.SITE_RECIPIENTS.items()}
+    global_ids = set(subscriptions.GLOBAL_RECIPIENTS)
+    per_chat = {}
+    if global_ids:
+        preds = await predictor.batch_predict()
+        for chat_id in global_ids:
+            per_chat.setdefault(chat_id, []).extend(preds)
+    for site, chat_ids in by_site.items():
         try:
-            await asyncio.sleep(interval)
-        except asyncio.CancelledError:
-            break
+            p = await predictor.model_predict(site)
+        except Exception:
+            logger.exception("Failed to compute prediction for %s", site)
+            continue
+        for chat_id in chat_ids:
+            per_chat.setdefault(chat_id, []).append(p)
+    saved = 0
+    for chat_id, predictions in per_chat.items():
+        lang = subscriptions.CHAT_LANG.get(chat_id)
+        DISPATCH_STATS['predictions_delivered'] += len(predictions)
+        if settings.SIGNAL_DIGEST and subscriptions.CHAT_DIGEST.get(chat_id, True) and len(predictions) > 1:
+            await _send_digest_to_user(bot, chat_id, lang, predictions)
+            DISPATCH_STATS['messages_sent'] += 1
+            saved += len(predictions) - 1
+            continue
+        for p in predictions:
+            await _send_prediction_to_user(bot, chat_id, lang, p)
+        DISPATCH_STATS['messages_sent'] += len(predictions)
+    DISPATCH_STATS['ticks'] += 1
+    DISPATCH_STATS['api_calls_saved'] += saved
+    DISPATCH_STATS['last_tick_saved'] = saved
+    if saved:
+        logger.info("Signal digests saved %s send_message calls this tick", saved)
+
+def build_supervisor(app) -> Supervisor:
+    """Register every periodic background job of the bot process."""
+    from .tasks import collect_due_sites
+    from .alert_dispatcher import send_pending_alerts
+    from .retention import run_retention
+    from .ingest import observation_buffer
+    sup = Supervisor(backoff_max=settings.JOB_BACKOFF_MAX)
+    sup.add_job('dispatch', lambda: dispatch_signals(app.bot), settings.PREDICTION_INTERVAL)
+    sup.add_job('collect', collect_due_sites, settings.COLLECTION_TICK)
+    sup.add_job('alert', lambda: send_pending_alerts(app), settings.COLLECTION_INTERVAL)
+    sup.add_job('ingest_flush', observation_buffer.flush_if_due, settings.INGEST_FLUSH_INTERVAL)
+    # give startup some room before the first (potentially long) maintenance run
+    sup.add_job('retention', run_retention, settings.RETENTION_INTERVAL, initial_delay=60)
+    # /subscribe and /unsubscribe may land on other workers: refresh the leader's index
+    sup.add_job('subscriber_index', subscriptions.rebuild_index, settings.SUBSCRIBER_INDEX_REFRESH,
+                initial_delay=settings.SUBSCRIBER_INDEX_REFRESH)
+    return sup
+
+
+async def refresh_follower_stats(app):
+    """Rebuild the rolling windows from the DB unless this process is the leader (whose collector feeds them)."""
+    leader = getattr(app, 'leader', None)
+    if leader is not None and leader.is_leader:
+        return
+    await site_stats.rebuild()
+
+
+def build_follower_supervisor(app) -> Supervisor:
+    """Jobs every worker runs, leader or not."""
+    sup = Supervisor(backoff_max=settings.JOB_BACKOFF_MAX)
+    sup.add_job('site_stats', lambda: refresh_follower_stats(app), settings.SITE_STATS_REFRESH)
+    return sup
+
+
+async def start_background_jobs(app):
+    """Run on the process that holds the leader lease (or on every process without election)."""
+    # migrate legacy preferred_sites and load the subscriber index
+    await subscriptions.migrate_preferred_sites()
+    await subscriptions.rebuild_index()
+    # windows may be stale from the time this worker spent as a follower
+    await site_stats.rebuild()
+    app.supervisor.start()
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/digest [on|off] - combine signals into one message per tick (toggles without argument)"""
+    lang = _lang_from_user(update.effective_user)
+    user_id = update.effective_user.id
+    arg = (context.args[0].lower() if context.args else '')
+    async with AsyncSessionLocal() as session:
+        result = (await session.execute(select(User).filter_by(telegram_id=user_id))).scalars().first()
+        if not result or not result.subscribed:
+            await update.message.reply_text(t(lang, 'not_subscribed'))
+            return
+        current = result.digest is not False
+        enabled = {'on': True, 'off': False}.get(arg, not current)
+        result.digest = enabled
+        await session.commit()
+    subscriptions.set_digest(user_id, enabled)
+    await update.message.reply_text(t(lang, 'digest_on' if enabled else 'digest_off'))
+
+def _is_admin(usr) -> bool:
+    admin = settings.ADMIN_USERNAME.lstrip('@')
+    return (usr.username or '') == admin or str(usr.id) == admin
+
 
 async def collect_now_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     usr = update.effective_user
-    admin = settings.ADMIN_USERNAME.lstrip('@')
-    if (usr.username or '') != admin and str(usr.id) != admin:
+    if not _is_admin(usr):
         await update.message.reply_text("Not authorized")
         return
     sites = [s.strip() for s in ' '.join(context.args).split(',')] if context.args else None
@@ -179,6 +274,30 @@ async def collect_now_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text(t(_lang_from_user(usr), 'error', msg=str(e)))
 
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile <seconds> profiles the process; /profile <job> [runs] profiles the next runs of a job."""
+    usr = update.effective_user
+    if not _is_admin(usr):
+        await update.message.reply_text("Not authorized")
+        return
+    from .profiling import profiler
+    lang = _lang_from_user(usr)
+    args = context.args or []
+    sup = getattr(context.application, 'supervisor', None)
+    try:
+        if args and sup and args[0] in sup.jobs:
+            runs = int(args[1]) if len(args) > 1 else 1
+            profiler.arm(args[0], runs)
+            await update.message.reply_text(t(lang, 'profile_armed', job=args[0], runs=profiler.armed[args[0]]))
+            return
+        report = await profiler.profile_for(float(args[0]) if args else 10)
+        # Telegram caps messages at 4096 characters
+        await update.message.reply_text(t(lang, 'profile_done', path=report['path'], seconds=report['wall_seconds']) + '\n' + report['stats'][:3500])
+    except Exception as e:
+        logger.exception("profile_command failed: %s", e)
+        await update.message.reply_text(t(lang, 'error', msg=str(e)))
+
+
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang = _lang_from_user(update.effective_user)
     async with AsyncSessionLocal() as session:
@@ -198,7 +317,14 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def build_and_run_bot():
-    app = ApplicationBuilder().token(settings.BOT_TOKEN).build()
+    # updates are handled concurrently (capped), one at a time per chat
+    app = (
+        ApplicationBuilder()
+        .token(settings.BOT_TOKEN)
+        .application_class(ChatOrderedApplication)
+        .concurrent_updates(settings.BOT_CONCURRENT_UPDATES)
+        .build()
+    )
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CommandHandler('verify', verify))
     app.add_handler(CommandHandler('contact_admin', contact_admin))
@@ -206,35 +332,53 @@ async def build_and_run_bot():
     app.add_handler(CommandHandler('predict', predict_command))
     app.add_handler(CommandHandler('subscribe', subscribe_command))
     app.add_handler(CommandHandler('unsubscribe', unsubscribe_command))
+    app.add_handler(CommandHandler('digest', digest_command))
     app.add_handler(CommandHandler('sites', sites_command))
     app.add_handler(CommandHandler('collect_now', collect_now_command))
+    app.add_handler(CommandHandler('profile', profile_command))
     app.add_handler(CommandHandler('stats', stats_command))
     app.add_handler(CallbackQueryHandler(site_callback, pattern='^site:'))
     app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), message_handler))
 
     await app.initialize()
     await app.start()
-    # start background dispatcher
-    app.signal_task = asyncio.create_task(signal_dispatcher(app))
-    # start collection loop
-    from .tasks import collect_loop
-    app.collect_task = asyncio.create_task(collect_loop(app))
-    # start alert dispatcher
-    from .alert_dispatcher import alert_loop
-    app.alert_task = asyncio.create_task(alert_loop(app))
-    logger.info("Started signal dispatcher with interval %s seconds", settings.PREDICTION_INTERVAL)
-    logger.info("Started collect loop with interval %s seconds", settings.COLLECTION_INTERVAL)
-    logger.info("Started alert loop")
+    # restore persisted odds snapshots, if configured
+    from .odds_cache import odds_snapshots
+    odds_snapshots.load()
+    # periodic jobs (dispatch, collect, alert, ingest flush, retention); every worker serves
+    # webhooks but only the elected leader runs these
+    app.supervisor = build_supervisor(app)
+    if settings.LEADER_ELECTION:
+        app.leader = LeaderElector(on_elected=lambda: start_background_jobs(app), on_demoted=app.supervisor.stop)
+        # followers get no collector feed: load the per-site rolling history now and keep it fresh
+        app.follower_jobs = build_follower_supervisor(app)
+        app.follower_jobs.start()
+        app.leader.start()
+    else:
+        await start_background_jobs(app)
     return app
 
 
 async def stop_bot(app):
     try:
-        if hasattr(app, 'signal_task') and not app.signal_task.done():
-            app.signal_task.cancel()
-            await app.signal_task
+        if getattr(app, 'leader', None):
+            await app.leader.stop()
+        if getattr(app, 'supervisor', None):
+            await app.supervisor.stop()
+        if getattr(app, 'follower_jobs', None):
+            await app.follower_jobs.stop()
+    except Exception:
+        logger.exception("Error stopping background jobs")
+    try:
+        from .ingest import observation_buffer
+        await observation_buffer.close()
+    except Exception:
+        logger.exception("Error flushing observation buffer")
+    try:
+        from .odds_cache import odds_snapshots
+        odds_snapshots.save()
     except Exception:
-        logger.exception("Error cancelling signal task")
+        logger.exception("Error saving odds snapshots")
     await app.stop()
     await app.shutdown()
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
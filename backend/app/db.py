@@ -1,9 +1,49 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, Float, UniqueConstraint, Index, event, inspect, text
+from sqlalchemy.exc import DBAPIError
 from .config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith('sqlite')
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (':memory:' in url or url.rstrip('/').endswith(':'))
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Apply the SQLite performance profile from settings to a fresh DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def make_engine(url: str, tuned: bool = True):
+    """Create the async engine. With tuned=True, file-backed SQLite gets WAL/pragmas and a sized pool."""
+    kwargs = {'echo': False}
+    if tuned and not _is_memory_sqlite(url):
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=not _is_sqlite(url),
+        )
+    eng = create_async_engine(url, **kwargs)
+    if tuned and _is_sqlite(url) and not _is_memory_sqlite(url):
+        event.listen(eng.sync_engine, 'connect', apply_sqlite_pragmas)
+    return eng
+
+
+engine = make_engine(settings.DATABASE_URL)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -18,9 +58,23 @@ class User(Base):
     subscribed = Column(Boolean, default=False)
     language = Column(String, default='en')
     preferred_sites = Column(String, nullable=True)
+    digest = Column(Boolean, default=True)  # one combined signal message per tick
+
+class UserSite(Base):
+    """Normalized user -> site subscription (one row per preferred site)."""
+    __tablename__ = "user_sites"
+    __table_args__ = (UniqueConstraint('telegram_id', 'site', name='uq_user_sites_user_site'),)
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(Integer, index=True, nullable=False)
+    site = Column(String, index=True, nullable=False)
 
 class Observation(Base):
     __tablename__ = "observations"
+    # keyset pagination on (ts, id) for exports, backtests and per-site scans
+    __table_args__ = (
+        Index('ix_observations_ts_id', 'ts', 'id'),
+        Index('ix_observations_site_ts_id', 'site', 'ts', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     site = Column(String, index=True, nullable=True)
     odds = Column(String, nullable=True)
@@ -28,6 +82,22 @@ class Observation(Base):
     ts = Column(Integer, nullable=False)
 
 
+class ObservationSummary(Base):
+    """Per-site, per-bucket rollup of observations that were aged out of the raw table."""
+    __tablename__ = "observation_summaries"
+    __table_args__ = (UniqueConstraint('site', 'bucket_ts', name='uq_observation_summaries_site_bucket'),)
+    id = Column(Integer, primary_key=True, index=True)
+    site = Column(String, index=True, nullable=True)
+    bucket_ts = Column(Integer, index=True, nullable=False)
+    n_obs = Column(Integer, default=0)
+    n_odds = Column(Integer, default=0)
+    odds_sum = Column(Float, default=0.0)
+    odds_min = Column(Float, nullable=True)
+    odds_max = Column(Float, nullable=True)
+    n_labeled = Column(Integer, default=0)
+    multiplier_sum = Column(Float, default=0.0)
+
+
 class SiteBlacklist(Base):
     __tablename__ = "site_blacklist"
     id = Column(Integer, primary_key=True, index=True)
@@ -37,6 +107,25 @@ class SiteBlacklist(Base):
     last_failure_ts = Column(Integer, nullable=True)
 
 
+class LeaderLease(Base):
+    """Lease held by the one process that runs the background jobs (see app.leader)."""
+    __tablename__ = "leader_leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    term = Column(Integer, default=1)  # bumped on every takeover
+    expires_at = Column(Float, nullable=False)
+    renewed_at = Column(Float, nullable=True)
+
+
+class SharedOddsSnapshot(Base):
+    """Latest collector snapshot per site, so workers that do not collect can serve it too."""
+    __tablename__ = "odds_snapshots"
+    key = Column(String, primary_key=True)
+    site = Column(String, nullable=True)
+    odds = Column(String, nullable=True)  # JSON list
+    ts = Column(Float, nullable=False)
+
+
 class AdminAlert(Base):
     __tablename__ = "admin_alerts"
     id = Column(Integer, primary_key=True, index=True)
@@ -45,6 +134,57 @@ class AdminAlert(Base):
     sent = Column(Boolean, default=False)
 
 
+def _literal(value) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def add_missing_columns(sync_conn):
+    """create_all() never alters existing tables: add columns introduced since the table was created.
+
+    Every worker runs this at startup, so another worker may add the column between our
+    inspection and the ALTER; that error is treated as done once a fresh inspection agrees.
+    """
+    insp = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c['name'] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=sync_conn.dialect)}"
+            if col.default is not None and col.default.is_scalar:
+                ddl += f" DEFAULT {_literal(col.default.arg)}"
+            try:
+                sync_conn.execute(text(ddl))
+            except DBAPIError:
+                if col.name not in {c['name'] for c in inspect(sync_conn).get_columns(table.name)}:
+                    raise
+
+
+def add_missing_indexes(sync_conn):
+    """Like add_missing_columns, for indexes declared after a table was created (same race handling)."""
+    insp = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {i['name'] for i in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(sync_conn, checkfirst=True)
+            except DBAPIError:
+                if index.name not in {i['name'] for i in inspect(sync_conn).get_indexes(table.name)}:
+                    raise
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_indexes)
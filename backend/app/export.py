@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import zlib
+from typing import Optional, List, Dict, Any, AsyncIterator
+from sqlalchemy import select, and_, or_
+from .db import Observation
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_FIELDS = ['id', 'site', 'ts', 'odds', 'multiplier']
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+async def iter_observation_pages(engine=None, sites: Optional[List[str]] = None, since: Optional[int] = None,
+                                 until: Optional[int] = None, page_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield observations in (ts, id) order, one keyset page at a time.
+
+    Each page uses its own short connection, so a slow consumer never pins a connection or
+    a read snapshot, and memory is bounded by one page.
+    """
+    engine = _get_engine(engine)
+    obs = Observation.__table__
+    cond = []
+    if sites:
+        cond.append(obs.c.site.in_(sites))
+    if since is not None:
+        cond.append(obs.c.ts >= since)
+    if until is not None:
+        cond.append(obs.c.ts < until)
+    last = None
+    while True:
+        q = select(obs.c.id, obs.c.site, obs.c.ts, obs.c.odds, obs.c.multiplier).where(*cond)
+        if last is not None:
+            q = q.where(or_(obs.c.ts > last[0], and_(obs.c.ts == last[0], obs.c.id > last[1])))
+        async with engine.connect() as conn:
+            page = (await conn.execute(q.order_by(obs.c.ts, obs.c.id).limit(page_size))).mappings().all()
+        if not page:
+            return
+        last = (page[-1]['ts'], page[-1]['id'])
+        yield [dict(r) for r in page]
+
+
+def _encode_ndjson(page: List[Dict[str, Any]]) -> bytes:
+    return ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in page).encode('utf-8')
+
+
+def _encode_csv(page: List[Dict[str, Any]], header: bool) -> bytes:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, lineterminator='\n')
+    if header:
+        writer.writeheader()
+    writer.writerows(page)
+    return buf.getvalue().encode('utf-8')
+
+
+async def export_observations(fmt: str = 'ndjson', compress: bool = False, engine=None, sites: Optional[List[str]] = None,
+                              since: Optional[int] = None, until: Optional[int] = None,
+                              page_size: int = 5000) -> AsyncIterator[bytes]:
+    """Stream observations as NDJSON or CSV bytes, one chunk per page, optionally gzip-compressed."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    # wbits=31 produces a gzip container, so the output is a plain .gz file
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(chunk: bytes) -> bytes:
+        return gz.compress(chunk) if gz is not None else chunk
+
+    if fmt == 'csv':
+        header = emit(_encode_csv([], header=True))
+        if header:
+            yield header
+    async for page in iter_observation_pages(engine, sites, since, until, page_size):
+        out = emit(_encode_ndjson(page) if fmt == 'ndjson' else _encode_csv(page, header=False))
+        if out:
+            yield out
+    if gz is not None:
+        yield gz.flush()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import logging
+from typing import Optional, List, Dict, Any
+from sqlalchemy import insert
+from .db import Observation
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ObservationBuffer:
+    """Write-behind buffer for observations.
+
+    Producers (collector, backfills, replay tools) call add() which only appends to memory.
+    Rows are written as one core-level bulk INSERT in a short transaction when the buffer
+    reaches max_rows or its oldest row is older than max_age seconds, so DB writes never
+    overlap with network waits.
+    """
+
+    def __init__(self, engine=None, max_rows: Optional[int] = None, max_age: Optional[float] = None):
+        self._engine = engine
+        self.max_rows = max_rows or settings.INGEST_BATCH_SIZE
+        self.max_age = max_age if max_age is not None else settings.INGEST_FLUSH_INTERVAL
+        self._rows: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {
+            'rows_buffered': 0,
+            'rows_flushed': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'last_flush_rows': 0,
+            'last_flush_latency': 0.0,
+            'last_flush_rows_per_sec': 0.0,
+        }
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from .db import engine
+            self._engine = engine
+        return self._engine
+
+    def __len__(self):
+        return len(self._rows)
+
+    async def add(self, site: Optional[str], odds: Optional[str], multiplier: Optional[str] = None, ts: Optional[int] = None):
+        self._rows.append({'site': site, 'odds': odds, 'multiplier': multiplier, 'ts': ts or int(time.time())})
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self.stats['rows_buffered'] += 1
+        if len(self._rows) >= self.max_rows:
+            await self.flush()
+
+    def is_due(self) -> bool:
+        if not self._rows:
+            return False
+        return len(self._rows) >= self.max_rows or (time.monotonic() - self._oldest) >= self.max_age
+
+    async def flush_if_due(self) -> int:
+        if self.is_due():
+            return await self.flush()
+        return 0
+
+    async def flush(self) -> int:
+        """Write every buffered row in one transaction. On failure rows are kept for the next attempt."""
+        async with self._flush_lock:
+            if not self._rows:
+                return 0
+            rows, self._rows, self._oldest = self._rows, [], None
+            t0 = time.perf_counter()
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(Observation.__table__), rows)
+            except Exception:
+                self.stats['flush_errors'] += 1
+                logger.exception("Failed to flush %s buffered observations", len(rows))
+                self._rows = rows + self._rows
+                self._oldest = time.monotonic()
+                raise
+            latency = time.perf_counter() - t0
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += len(rows)
+            self.stats['last_flush_rows'] = len(rows)
+            self.stats['last_flush_latency'] = round(latency, 6)
+            self.stats['last_flush_rows_per_sec'] = round(len(rows) / latency, 1) if latency > 0 else 0.0
+            logger.debug("Flushed %s observations in %.4fs", len(rows), latency)
+            return len(rows)
+
+    async def close(self):
+        """Durably write everything still buffered (time-based flushes come from the ingest_flush job)."""
+        await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats, pending=len(self._rows))
+
+
+# process-wide buffer shared by every producer
+observation_buffer = ObservationBuffer()
@@ -0,0 +1,139 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import time
+from typing import Dict, Any, Iterator, List, Tuple, Optional
+import numpy as np
+from sqlalchemy import select, update, insert, bindparam
+from .db import Observation
+from .scrapers import canonical_site
+
+logger = logging.getLogger(__name__)
+
+Label = Tuple[str, int, float]
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def _open_text(path: str):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def _parse(rec: Dict[str, Any]) -> Optional[Label]:
+    try:
+        site = str(rec['site']).strip()
+        ts = int(float(rec['ts']))
+        multiplier = float(rec['multiplier'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    # '1xbet' or 'williamhill.com' must land on the collector's canonical site name
+    return (canonical_site(site) or site, ts, multiplier) if site else None
+
+
+def iter_label_chunks(path: str, chunk_size: int = 50000, stats: Optional[Dict[str, int]] = None) -> Iterator[List[Label]]:
+    """Stream (site, ts, multiplier) records from a CSV or NDJSON file (optionally .gz) in chunks."""
+    stats = stats if stats is not None else {}
+    name = path[:-3] if path.endswith('.gz') else path
+    with _open_text(path) as f:
+        if name.endswith('.csv'):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        chunk: List[Label] = []
+        for rec in records:
+            label = _parse(rec)
+            if label is None:
+                stats['invalid'] = stats.get('invalid', 0) + 1
+                continue
+            chunk.append(label)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def match_nearest(obs_ts: np.ndarray, label_ts: np.ndarray, tolerance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the nearest observation for each label (obs_ts sorted) and whether it is within tolerance."""
+    if not len(obs_ts):
+        return np.zeros(len(label_ts), dtype=np.int64), np.zeros(len(label_ts), dtype=bool)
+    right = np.clip(np.searchsorted(obs_ts, label_ts), 0, len(obs_ts) - 1)
+    left = np.clip(right - 1, 0, len(obs_ts) - 1)
+    use_left = np.abs(label_ts - obs_ts[left]) <= np.abs(obs_ts[right] - label_ts)
+    nearest = np.where(use_left, left, right)
+    return nearest, np.abs(obs_ts[nearest] - label_ts) <= tolerance
+
+
+async def _import_site(conn, site: str, labels: List[Label], tolerance: int, insert_unmatched: bool,
+                       overwrite: bool, stats: Dict[str, int]):
+    obs = Observation.__table__
+    label_ts = np.fromiter((l[1] for l in labels), dtype=np.int64, count=len(labels))
+    mult = np.fromiter((l[2] for l in labels), dtype=float, count=len(labels))
+    # one range query per site and chunk; rows come back sorted by the (site, ts, id) index
+    rows = (await conn.execute(
+        select(obs.c.id, obs.c.ts)
+        .where(obs.c.site == site, obs.c.ts >= int(label_ts.min()) - tolerance, obs.c.ts <= int(label_ts.max()) + tolerance)
+        .order_by(obs.c.ts, obs.c.id)
+    )).all()
+    obs_id = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    obs_ts = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    nearest, ok = match_nearest(obs_ts, label_ts, tolerance)
+    matched = np.flatnonzero(ok)
+    if len(matched):
+        # several labels may land on one observation: the closest one wins
+        dist = np.abs(obs_ts[nearest[matched]] - label_ts[matched])
+        order = matched[np.lexsort((dist, nearest[matched]))]
+        _, first = np.unique(nearest[order], return_index=True)
+        winners = order[first]
+        stats['duplicates'] += len(matched) - len(winners)
+        stmt = update(obs).where(obs.c.id == bindparam('oid')).values(multiplier=bindparam('mult'))
+        if not overwrite:
+            stmt = stmt.where(obs.c.multiplier.is_(None))
+        res = await conn.execute(stmt, [{'oid': int(i), 'mult': str(m)} for i, m in zip(obs_id[nearest[winners]], mult[winners])])
+        stats['matched'] += len(winners)
+        stats['updated'] += max(res.rowcount, 0) if res.rowcount is not None else len(winners)
+    unmatched = np.flatnonzero(~ok)
+    if len(unmatched):
+        if insert_unmatched:
+            await conn.execute(insert(obs), [
+                {'site': site, 'ts': int(label_ts[i]), 'odds': None, 'multiplier': str(mult[i])} for i in unmatched])
+            stats['inserted'] += len(unmatched)
+        else:
+            stats['unmatched'] += len(unmatched)
+
+
+async def import_labels(path: str, engine=None, tolerance: int = 30, chunk_size: int = 50000,
+                        insert_unmatched: bool = False, overwrite: bool = True) -> Dict[str, Any]:
+    """Attach crash multipliers from a CSV/NDJSON file to the nearest observation of the same site.
+
+    Labels are read in chunks. For each chunk and site, one range query loads the candidate
+    observations and np.searchsorted matches every label to the closest observation within
+    `tolerance` seconds. Updates go out as one executemany per site in a single transaction
+    per chunk. Labels without a match are counted, or inserted as label-only observations
+    with insert_unmatched.
+    """
+    engine = _get_engine(engine)
+    stats = {'records': 0, 'invalid': 0, 'matched': 0, 'updated': 0, 'duplicates': 0, 'unmatched': 0, 'inserted': 0}
+    t0 = time.perf_counter()
+    for chunk in iter_label_chunks(path, chunk_size, stats):
+        stats['records'] += len(chunk)
+        by_site: Dict[str, List[Label]] = {}
+        for label in chunk:
+            by_site.setdefault(label[0], []).append(label)
+        async with engine.begin() as conn:
+            for site, labels in by_site.items():
+                await _import_site(conn, site, labels, tolerance, insert_unmatched, overwrite, stats)
+        logger.info("Imported %s labels so far (%s matched)", stats['records'], stats['matched'])
+    elapsed = time.perf_counter() - t0
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_sec'] = round(stats['records'] / elapsed, 1) if elapsed else None
+    return stats
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional, Callable, Awaitable, Dict, Any
+from sqlalchemy import update, insert, select, or_, case
+from sqlalchemy.exc import IntegrityError
+from .db import LeaderLease
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def default_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderElector:
+    """Lease-based leader election stored in the shared database.
+
+    Every process calls try_acquire() each renew_interval. A single conditional UPDATE takes
+    the lease when this process already holds it (heartbeat) or when it has expired (takeover);
+    the first process ever inserts the row, and a primary-key conflict means someone else won.
+    Leases use wall-clock time since they are compared across processes.
+
+    Each successful heartbeat arms a timer that steps down `margin` seconds before the lease
+    expires, so a leader that cannot renew (DB down or locked) stops its jobs before any
+    follower may take over, provided host clocks differ by less than the margin.
+
+    on_elected runs in its own task so slow startup work never delays heartbeats. If it
+    fails, the process steps down and releases the lease; the next heartbeat retries.
+    """
+
+    def __init__(self, name: str = 'background', holder: Optional[str] = None, ttl: Optional[float] = None,
+                 renew_interval: Optional[float] = None, engine=None,
+                 on_elected: Optional[Callable[[], Awaitable[Any]]] = None,
+                 on_demoted: Optional[Callable[[], Awaitable[Any]]] = None,
+                 clock=time.time):
+        self.name = name
+        self.holder = holder or default_holder_id()
+        self.ttl = float(ttl or settings.LEADER_LEASE_TTL)
+        self.renew_interval = float(renew_interval or settings.LEADER_RENEW_INTERVAL)
+        self._engine = engine
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self._clock = clock
+        self.margin = min(self.ttl * 0.1, self.renew_interval)
+        self._task: Optional[asyncio.Task] = None
+        self._elect_task: Optional[asyncio.Task] = None
+        self._expiry_task: Optional[asyncio.Task] = None
+        self.is_leader = False
+        self.term: Optional[int] = None
+        self.lease_expires = 0.0
+        self.stats = {'elections': 0, 'demotions': 0, 'renewals': 0, 'renew_errors': 0, 'expired': 0, 'hook_errors': 0}
+
+    async def try_acquire(self) -> bool:
+        """Heartbeat or take over the lease; returns whether this process holds it now."""
+        engine = _get_engine(self._engine)
+        leases = LeaderLease.__table__
+        now = self._clock()
+        expires = now + self.ttl
+        async with engine.begin() as conn:
+            res = await conn.execute(
+                update(leases)
+                .where(leases.c.name == self.name, or_(leases.c.holder == self.holder, leases.c.expires_at < now))
+                .values(
+                    holder=self.holder,
+                    expires_at=expires,
+                    renewed_at=now,
+                    term=case((leases.c.holder == self.holder, leases.c.term), else_=leases.c.term + 1),
+                )
+            )
+            if res.rowcount == 1:
+                self.term = (await conn.execute(select(leases.c.term).where(leases.c.name == self.name))).scalar()
+                self.lease_expires = expires
+                return True
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(insert(leases).values(
+                    name=self.name, holder=self.holder, term=1, expires_at=expires, renewed_at=now))
+        except IntegrityError:
+            # the lease exists and is held by someone else
+            return False
+        self.term = 1
+        self.lease_expires = expires
+        return True
+
+    async def release(self):
+        """Expire our lease right away so a follower does not have to wait for the TTL."""
+        leases = LeaderLease.__table__
+        async with _get_engine(self._engine).begin() as conn:
+            await conn.execute(
+                update(leases)
+                .where(leases.c.name == self.name, leases.c.holder == self.holder)
+                .values(expires_at=0.0)
+            )
+        self.lease_expires = 0.0
+
+    @staticmethod
+    async def _cancel(task: Optional[asyncio.Task]):
+        if task is None or task is asyncio.current_task() or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    def _arm_expiry(self):
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+        self._expiry_task = asyncio.create_task(self._expire_after(self.lease_expires - self.margin - self._clock()))
+
+    async def _expire_after(self, delay: float):
+        await asyncio.sleep(max(0.0, delay))
+        self.stats['expired'] += 1
+        logger.warning("%s could not renew its lease in time, stepping down", self.holder)
+        await self._set_leader(False)
+
+    async def _elected(self):
+        try:
+            if self.on_elected is not None:
+                await self.on_elected()
+        except Exception:
+            self.stats['hook_errors'] += 1
+            logger.exception("Leader elected hook failed, giving up the lease")
+            await self._set_leader(False)
+            try:
+                await self.release()
+            except Exception:
+                logger.exception("Failed to release leader lease")
+
+    async def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            self.stats['elections'] += 1
+            logger.info("%s became leader of %r (term %s)", self.holder, self.name, self.term)
+            self._elect_task = asyncio.create_task(self._elected())
+            return
+        self.stats['demotions'] += 1
+        logger.warning("%s lost leadership of %r", self.holder, self.name)
+        await self._cancel(self._expiry_task)
+        await self._cancel(self._elect_task)
+        self._expiry_task = self._elect_task = None
+        if self.on_demoted is not None:
+            try:
+                await self.on_demoted()
+            except Exception:
+                logger.exception("Leader demoted hook failed")
+
+    async def tick(self) -> bool:
+        try:
+            leader = await self.try_acquire()
+        except Exception:
+            self.stats['renew_errors'] += 1
+            logger.exception("Leader lease heartbeat failed")
+            # keep the role for now: the expiry timer steps down if renewals keep failing
+            return self.is_leader
+        if leader:
+            self.stats['renewals'] += 1
+            self._arm_expiry()
+        await self._set_leader(leader)
+        return leader
+
+    async def _run(self):
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, release: bool = True):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        was_leader = self.is_leader
+        await self._set_leader(False)
+        if was_leader and release:
+            try:
+                await self.release()
+            except Exception:
+                logger.exception("Failed to release leader lease")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            holder=self.holder,
+            is_leader=self.is_leader,
+            term=self.term,
+            lease_expires_in=round(max(0.0, self.lease_expires - self._clock()), 1) if self.is_leader else None,
+        )
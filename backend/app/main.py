@@ -1,6 +1,8 @@
 import asyncio
 import logging
-from fastapi import FastAPI, Request, HTTPException
+from typing import Optional, List
+from fastapi import FastAPI, Request, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
 from .bot import build_and_run_bot, stop_bot
 from .db import init_db
 from .config import settings
@@ -56,6 +58,92 @@ async def telegram_webhook(token: str, request: Request):
 async def healthz():
     return {"status": "ok"}
 
+def _require_admin(token: str):
+    """Admin endpoints need X-Admin-Token == SECRET_KEY; they are disabled while SECRET_KEY is empty."""
+    if not settings.SECRET_KEY or token != settings.SECRET_KEY:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/metrics")
+async def metrics(x_admin_token: str = Header(default="")):
+    _require_admin(x_admin_token)
+    from .ingest import observation_buffer
+    from .retention import RETENTION_STATS
+    from .odds_cache import odds_snapshots
+    from .site_stats import site_stats
+    from .scrapers import url_flight, FETCH_STATS
+    from .proxy_pool import proxy_pool
+    from .subscriptions import index_stats
+    from .bot import DISPATCH_STATS
+    from .update_processing import update_stats
+    return {
+        "ingest": observation_buffer.snapshot(),
+        "retention": RETENTION_STATS,
+        "odds_cache": odds_snapshots.snapshot(),
+        "site_stats": site_stats.snapshot(),
+        "scrape_singleflight": url_flight.snapshot(),
+        "proxies": proxy_pool.snapshot(),
+        "fetch": FETCH_STATS,
+        "subscribers": index_stats(),
+        "dispatch": DISPATCH_STATS,
+        "updates": update_stats(),
+        "leader": bot_app.leader.snapshot() if getattr(bot_app, 'leader', None) else None,
+    }
+
+@app.get("/admin/jobs")
+async def admin_jobs(x_admin_token: str = Header(default="")):
+    _require_admin(x_admin_token)
+    sup = getattr(bot_app, 'supervisor', None) if bot_app else None
+    leader = getattr(bot_app, 'leader', None) if bot_app else None
+    follower = getattr(bot_app, 'follower_jobs', None) if bot_app else None
+    return {"leader": leader.snapshot() if leader else None, "jobs": sup.snapshot() if sup else [],
+            "follower_jobs": follower.snapshot() if follower else []}
+
+@app.get("/admin/profile")
+async def admin_profile_status(x_admin_token: str = Header(default="")):
+    _require_admin(x_admin_token)
+    from .profiling import profiler
+    return profiler.snapshot()
+
+@app.post("/admin/profile")
+async def admin_profile(seconds: float = 0, job: str = "", runs: int = 1, x_admin_token: str = Header(default="")):
+    """Profile the process for `seconds`, or arm the next `runs` runs of a supervisor job."""
+    _require_admin(x_admin_token)
+    from .profiling import profiler
+    if job:
+        sup = getattr(bot_app, 'supervisor', None) if bot_app else None
+        if not sup or job not in sup.jobs:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        profiler.arm(job, runs)
+        return {"armed": profiler.armed}
+    if seconds <= 0:
+        raise HTTPException(status_code=400, detail="Pass seconds or job")
+    try:
+        return await profiler.profile_for(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/export")
+async def admin_export(format: str = "ndjson", site: Optional[List[str]] = Query(default=None),
+                       since: Optional[int] = None, until: Optional[int] = None, gzip: bool = False,
+                       x_admin_token: str = Header(default="")):
+    """Stream observations as NDJSON or CSV (optionally gzipped), filtered by site and [since, until)."""
+    _require_admin(x_admin_token)
+    from .export import export_observations, FORMATS
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    filename = f"observations.{format}" + ('.gz' if gzip else '')
+    return StreamingResponse(
+        export_observations(format, gzip, sites=site, since=since, until=until),
+        media_type='application/gzip' if gzip else FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/schedule")
+async def schedule(x_admin_token: str = Header(default="")):
+    _require_admin(x_admin_token)
+    from .tasks import collection_scheduler
+    return {"sites": collection_scheduler.snapshot()}
+
 # quick root page
 @app.get("/")
 async def root():
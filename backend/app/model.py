@@ -1,16 +1,23 @@
 import json
+import multiprocessing
+import re
 import time
-from typing import Tuple, List, Dict
-from sqlalchemy import select
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, List, Dict, Any, Optional
+from sqlalchemy import select, and_, or_
 from .db import Observation, AsyncSessionLocal
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 import joblib
 import os
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'model.pkl')
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'model.pkl')
+MANIFEST_NAME = 'manifest.json'
+GLOBAL_KEY = '__global__'
+MIN_SAMPLES = 20
 
 
 def _extract_features_from_odds(odds: List[float]) -> Dict[str, float]:
@@ -26,47 +33,198 @@ def _extract_features_from_odds(odds: List[float]) -> Dict[str, float]:
     }
 
 
-async def load_dataset(limit: int = 10000) -> Tuple[List[List[float]], List[float]]:
-    """Load observations that have a 'multiplier' label (non-null) and return X, y."""
+def _sample_from_row(odds_json, multiplier):
+    """Return (features, label) for a labeled row, or None when it cannot be used."""
+    if not multiplier:
+        return None
+    try:
+        odds = json.loads(odds_json) if odds_json else []
+        features = _extract_features_from_odds(odds)
+        return [features['mean'], features['std'], features['min'], features['max'], features['count']], float(multiplier)
+    except Exception:
+        return None
+
+
+async def load_dataset(limit: int = 10000, include_archive: bool = False) -> Tuple[List[List[float]], List[float]]:
+    """Load observations that have a 'multiplier' label (non-null) and return X, y in time order.
+
+    With include_archive=True, rows moved to the retention archive (all older than the
+    live table) are read first. `limit` caps the total number of samples, oldest first.
+    """
     X = []
     y = []
+    if include_archive:
+        from .retention import iter_archived_observations
+        for r in iter_archived_observations():
+            if len(X) >= limit:
+                return X, y
+            sample = _sample_from_row(r.get('odds'), r.get('multiplier'))
+            if sample:
+                X.append(sample[0])
+                y.append(sample[1])
     async with AsyncSessionLocal() as session:
-        q = await session.execute(select(Observation).limit(limit))
+        q = await session.execute(
+            select(Observation).where(Observation.multiplier.isnot(None))
+            .order_by(Observation.ts, Observation.id).limit(limit - len(X))
+        )
         rows = q.scalars().all()
         for r in rows:
-            try:
-                odds = json.loads(r.odds) if r.odds else []
-                if not r.multiplier:
-                    continue
-                features = _extract_features_from_odds(odds)
-                X.append([features['mean'], features['std'], features['min'], features['max'], features['count']])
-                y.append(float(r.multiplier))
-            except Exception:
-                continue
+            sample = _sample_from_row(r.odds, r.multiplier)
+            if sample:
+                X.append(sample[0])
+                y.append(sample[1])
     return X, y
 
 
+async def load_site_datasets(engine=None, page_size: int = 5000) -> Dict[str, Dict[str, list]]:
+    """Labeled samples grouped by site, each in time order ({'ts', 'X', 'y'} lists per site)."""
+    if engine is None:
+        from .db import engine
+    obs = Observation.__table__
+    out: Dict[str, Dict[str, list]] = {}
+    last = None
+    async with engine.connect() as conn:
+        while True:
+            q = select(obs.c.id, obs.c.site, obs.c.ts, obs.c.odds, obs.c.multiplier).where(obs.c.multiplier.isnot(None))
+            if last is not None:
+                q = q.where(or_(obs.c.ts > last[0], and_(obs.c.ts == last[0], obs.c.id > last[1])))
+            page = (await conn.execute(q.order_by(obs.c.ts, obs.c.id).limit(page_size))).all()
+            if not page:
+                break
+            last = (page[-1].ts, page[-1].id)
+            for r in page:
+                sample = _sample_from_row(r.odds, r.multiplier)
+                if sample:
+                    d = out.setdefault(r.site or 'unknown', {'ts': [], 'X': [], 'y': []})
+                    d['ts'].append(r.ts)
+                    d['X'].append(sample[0])
+                    d['y'].append(sample[1])
+    return out
+
+
+def time_split(X, y, test_fraction: float = 0.2):
+    """Split time-ordered samples so validation rows are all later than training rows."""
+    cut = max(1, int(len(y) * (1 - test_fraction)))
+    return X[:cut], X[cut:], y[:cut], y[cut:]
+
+
+def _fit(X, y, n_estimators: int):
+    X_train, X_test, y_train, y_test = time_split(np.array(X), np.array(y))
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=1)
+    model.fit(X_train, y_train)
+    mse = float(mean_squared_error(y_test, model.predict(X_test))) if len(y_test) else None
+    return model, {'mse': mse, 'n_train': len(y_train), 'n_test': len(y_test)}
+
+
 def train_and_save(X, y, n_estimators: int = 100) -> Dict[str, float]:
-    if len(X) < 20:
+    """Fit the global model on time-ordered samples (the newest 20% are held out)."""
+    if len(X) < MIN_SAMPLES:
         return {'ok': False, 'msg': 'Not enough labeled data to train. Need at least 20 samples.'}
-    X = np.array(X)
-    y = np.array(y)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42)
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
-    mse = float(mean_squared_error(y_test, preds))
-    # ensure models folder exists
-    models_dir = os.path.join(os.path.dirname(__file__), '..', 'models')
-    os.makedirs(models_dir, exist_ok=True)
+    model, res = _fit(X, y, n_estimators)
+    os.makedirs(MODELS_DIR, exist_ok=True)
     joblib.dump(model, MODEL_PATH)
-    return {'ok': True, 'mse': mse, 'n_train': len(y_train), 'n_test': len(y_test)}
+    return dict(res, ok=True)
+
+
+def _site_filename(site: str) -> str:
+    return 'site-' + re.sub(r'[^A-Za-z0-9]+', '_', site).strip('_').lower() + '.pkl'
+
+
+def _train_task(key: str, X, y, n_estimators: int, path: str) -> Dict[str, Any]:
+    """Worker-process entry point: fit and save one model, measuring wall time and peak memory."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        model, res = _fit(X, y, n_estimators)
+        joblib.dump(model, path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return dict(res, site=key, ok=True, path=os.path.basename(path),
+                seconds=round(time.perf_counter() - t0, 3), peak_mb=round(peak / 2 ** 20, 2))
+
+
+def train_per_site(datasets: Dict[str, Dict[str, list]], n_estimators: int = 100, max_workers: Optional[int] = None,
+                   models_dir: Optional[str] = None, min_samples: int = MIN_SAMPLES) -> Dict[str, Any]:
+    """Fit one model per site plus a global fallback in parallel processes and write a manifest.
+
+    Every fit holds out its newest 20% of samples. Sites below min_samples are skipped and
+    served by the global model.
+    """
+    models_dir = models_dir or MODELS_DIR
+    os.makedirs(models_dir, exist_ok=True)
+    tasks = {}
+    for site, d in datasets.items():
+        if len(d['y']) >= min_samples:
+            tasks[site] = (d['X'], d['y'], os.path.join(models_dir, _site_filename(site)))
+    # global fallback: every site's samples merged in time order
+    merged = sorted((t, x, v) for d in datasets.values() for t, x, v in zip(d['ts'], d['X'], d['y']))
+    if len(merged) >= min_samples:
+        tasks[GLOBAL_KEY] = ([m[1] for m in merged], [m[2] for m in merged], os.path.join(models_dir, 'model.pkl'))
+    results: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    # spawn: workers must not inherit the parent's event loop or DB connections
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {key: pool.submit(_train_task, key, X, y, n_estimators, path) for key, (X, y, path) in tasks.items()}
+        for key, fut in futures.items():
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                results[key] = {'site': key, 'ok': False, 'msg': repr(e)}
+    manifest = {
+        'created': int(time.time()),
+        'global': results.get(GLOBAL_KEY, {}).get('path') if results.get(GLOBAL_KEY, {}).get('ok') else None,
+        'sites': {k: {f: r.get(f) for f in ('path', 'mse', 'n_train', 'n_test')}
+                  for k, r in results.items() if k != GLOBAL_KEY and r.get('ok')},
+    }
+    tmp = os.path.join(models_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(models_dir, MANIFEST_NAME))
+    _MODEL_CACHE.clear()
+    return {
+        'ok': any(r.get('ok') for r in results.values()),
+        'seconds': round(time.perf_counter() - t0, 3),
+        'skipped': sorted(s for s in datasets if s not in tasks),
+        'results': results,
+    }
+
+
+# path -> (mtime, loaded object); models are loaded on first use and reloaded when the file changes
+_MODEL_CACHE: Dict[str, Tuple[float, Any]] = {}
+
+
+def _load_cached(path: str, loader):
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    hit = _MODEL_CACHE.get(path)
+    if hit is None or hit[0] != mtime:
+        hit = _MODEL_CACHE[path] = (mtime, loader(path))
+    return hit[1]
+
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
 
 
 def load_model() -> RandomForestRegressor:
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    return _load_cached(MODEL_PATH, joblib.load)
+
+
+def load_site_model(site: Optional[str], models_dir: Optional[str] = None):
+    """The site's model from the manifest, else the global model (None when nothing is trained)."""
+    models_dir = models_dir or MODELS_DIR
+    manifest = _load_cached(os.path.join(models_dir, MANIFEST_NAME), _read_manifest) or {}
+    entry = manifest.get('sites', {}).get(site) if site else None
+    if entry and entry.get('path'):
+        model = _load_cached(os.path.join(models_dir, entry['path']), joblib.load)
+        if model is not None:
+            return model
+    return _load_cached(os.path.join(models_dir, manifest.get('global') or 'model.pkl'), joblib.load)
 
 
 def predict_from_model(model, odds: List[float]) -> float:
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import time
+from typing import Optional, Dict, Any
+from sqlalchemy import select, delete, insert
+from . import scrapers
+from .config import settings
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class OddsSnapshotStore:
+    """Latest extracted odds per site (or URL), written by the collector and read on the request path.
+
+    get_or_refresh() serves a snapshot younger than max_age without touching the network.
+    Older or missing snapshots trigger a refresh; concurrent refreshes of the same key share
+    one in-flight fetch. A failed refresh falls back to the stale snapshot when there is one.
+
+    With shared=True the collector publishes its snapshots to the odds_snapshots table and a
+    local miss first reads that row, so workers that are not the collecting leader serve
+    fresh odds without scraping on the request path.
+    """
+
+    def __init__(self, max_age: Optional[float] = None, path: Optional[str] = None, fetcher=None,
+                 shared: bool = False, engine=None, max_keys: Optional[int] = None):
+        self.max_age = settings.ODDS_MAX_AGE if max_age is None else max_age
+        self.max_keys = max_keys or settings.ODDS_MAX_KEYS
+        self.path = settings.ODDS_SNAPSHOT_PATH if path is None else path
+        self._fetcher = fetcher
+        self.shared = shared
+        self._engine = engine
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._flight = SingleFlight()
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'stale_served': 0, 'shared_hits': 0}
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from .db import engine
+            self._engine = engine
+        return self._engine
+
+    def put(self, key: str, data: Dict[str, Any], ts: Optional[float] = None):
+        self._snapshots.pop(key, None)
+        while len(self._snapshots) >= self.max_keys:
+            # dicts keep insertion order and put() re-inserts, so the first key is the stalest
+            del self._snapshots[next(iter(self._snapshots))]
+        self._snapshots[key] = {
+            'site': data.get('site') or key,
+            'odds': list(data.get('odds') or []),
+            'raw': data.get('raw'),
+            'ts': ts or time.time(),
+        }
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._snapshots.get(key)
+
+    def age(self, key: str) -> Optional[float]:
+        snap = self._snapshots.get(key)
+        return None if snap is None else time.time() - snap['ts']
+
+    async def publish(self, key: str):
+        """Write the local snapshot for key to the shared table (no-op unless shared)."""
+        try:
+            async with self.engine.begin() as conn:
+                await self.publish_many([key], conn)
+        except Exception:
+            logger.exception("Failed to publish odds snapshot for %s", key)
+
+    async def publish_many(self, keys, conn):
+        """Write the local snapshots for keys to the shared table on an open connection (no-op unless shared)."""
+        snaps = {k: self._snapshots[k] for k in keys if k in self._snapshots}
+        if not self.shared or not snaps:
+            return
+        from .db import SharedOddsSnapshot
+        table = SharedOddsSnapshot.__table__
+        await conn.execute(delete(table).where(table.c.key.in_(list(snaps))))
+        await conn.execute(insert(table), [
+            {'key': k, 'site': s['site'], 'odds': json.dumps(s['odds']), 'ts': s['ts']} for k, s in snaps.items()])
+
+    async def _load_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        from .db import SharedOddsSnapshot
+        table = SharedOddsSnapshot.__table__
+        try:
+            async with self.engine.connect() as conn:
+                row = (await conn.execute(select(table.c.site, table.c.odds, table.c.ts).where(table.c.key == key))).first()
+        except Exception:
+            logger.exception("Failed to read shared odds snapshot for %s", key)
+            return None
+        if row is None:
+            return None
+        return {'site': row.site or key, 'odds': json.loads(row.odds or '[]'), 'raw': None, 'ts': row.ts}
+
+    async def _refresh(self, key: str) -> Dict[str, Any]:
+        fetcher = self._fetcher or scrapers.get_latest_odds
+        self.stats['refreshes'] += 1
+        data = await fetcher(key)
+        if not data.get('error'):
+            self.put(key, data)
+        return data
+
+    async def refresh(self, key: str) -> Dict[str, Any]:
+        return await self._flight.do(key, lambda: self._refresh(key))
+
+    async def get_or_refresh(self, key: Optional[str], max_age: Optional[float] = None) -> Dict[str, Any]:
+        if not key:
+            return {'site': None, 'odds': []}
+        max_age = self.max_age if max_age is None else max_age
+        snap = self._snapshots.get(key)
+        if snap is not None and time.time() - snap['ts'] <= max_age:
+            self.stats['hits'] += 1
+            return snap
+        if self.shared:
+            shared = await self._load_shared(key)
+            if shared is not None and time.time() - shared['ts'] <= max_age:
+                self.stats['shared_hits'] += 1
+                self.put(key, shared, ts=shared['ts'])
+                return shared
+        self.stats['misses'] += 1
+        try:
+            data = await self.refresh(key)
+        except Exception:
+            logger.exception("Odds refresh failed for %s", key)
+            data = {'site': key, 'odds': [], 'error': 'refresh_failed'}
+        if data.get('error') and snap is not None:
+            self.stats['stale_served'] += 1
+            return snap
+        return self._snapshots.get(key) or data
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._snapshots, f)
+        os.replace(tmp, path)
+
+    def load(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for key, snap in json.load(f).items():
+                    self.put(key, snap, ts=snap.get('ts'))
+        except Exception:
+            logger.exception("Failed to load odds snapshots from %s", path)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats, sites=len(self._snapshots), coalesced=self._flight.stats['suppressed'], inflight=self._flight.inflight())
+
+
+# process-wide store shared by the collector, predictor and bot handlers
+odds_snapshots = OddsSnapshotStore(shared=settings.ODDS_SHARED)
@@ -3,7 +3,9 @@ import hashlib
 import random
 import asyncio
 from typing import Dict, Any, Optional, List
-from . import scrapers
+from .odds_cache import odds_snapshots
+from .site_stats import site_stats
+from .scrapers import canonical_site
 from .db import Observation
 
 # Simple heuristic/pseudo-predictor with site data collection
@@ -15,15 +17,25 @@ def _seed_from_site(site: Optional[str]) -> int:
     return int(hashlib.sha256(s.encode()).hexdigest(), 16) % (2 ** 32)
 
 
-def _heuristic_from_odds(odds: List[float]) -> Dict[str, Any]:
+def _heuristic_from_odds(odds: List[float], history: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     # Aggregate odds to produce a single predicted odds and confidence
     if not odds:
+        if history:
+            # no live odds: the site's recent median beats a random guess
+            return {"odds": history['p50'], "confidence": 40}
         rnd = random.Random(_seed_from_site(None))
         odds_val = round(1.05 + rnd.random() * 2.0, 2)
         return {"odds": odds_val, "confidence": 35}
     avg = sum(odds) / len(odds)
     # confidence increases with number and spread
     conf = max(40, min(95, int(50 + (len(odds) ** 0.5) * 5 - (max(odds)-min(odds)))))
+    if history:
+        # agreeing with the site's rolling history raises confidence, an outlier lowers it
+        z = abs(avg - history['mean']) / max(history['std'], 0.05)
+        if z <= 1:
+            conf = min(95, conf + 5)
+        elif z > 2:
+            conf = max(35, conf - 10)
     return {"odds": round(avg, 2), "confidence": conf}
 
 
@@ -39,38 +51,45 @@ def predict(site: Optional[str] = None) -> Dict[str, Any]:
 async def model_predict(site_or_url: Optional[str] = None) -> Dict[str, Any]:
     """Asynchronous prediction that tries to use live odds and historical observations.
     Steps:
-    - If site_or_url is URL: try to fetch page and extract odds
-    - Else, try to fetch site homepage
-    - Use heuristic combination of recent odds to return a prediction
+    - Resolve the input to a known site; unknown sites and URLs are never fetched
+    - Read the latest odds snapshot for the site (refreshed by the collector)
+    - Only if the snapshot is missing or older than ODDS_MAX_AGE, fetch it (coalesced per site)
+    - Use heuristic combination of recent odds to return a prediction, checked against the
+      site's in-memory rolling history (no DB query)
     """
-    site = site_or_url
+    site = canonical_site(site_or_url)
+    if site:
+        site_or_url = site
+    history = site_stats.context(site)
     odds_list: List[float] = []
     try:
-        data = await scrapers.get_latest_odds(site_or_url)
+        data = await odds_snapshots.get_or_refresh(site) if site else {}
         odds_list = data.get('odds', []) if isinstance(data, dict) else []
     except Exception:
         odds_list = []
 
     # Try to use trained model
     try:
-        from .model import load_model, predict_from_model
-        model_obj = load_model()
+        from .model import load_site_model, predict_from_model
+        model_obj = load_site_model(site)
         if model_obj and odds_list:
             pred_value = predict_from_model(model_obj, odds_list)
             # confidence heuristic: if many odds, more confident
             conf = max(45, min(95, 40 + len(odds_list) * 5))
-            return {'site': (site_or_url or 'global'), 'odds': round(pred_value, 2), 'confidence': conf, 'ts': int(time.time())}
+            return {'site': (site_or_url or 'global'), 'odds': round(pred_value, 2), 'confidence': conf, 'ts': int(time.time()),
+                    'history': history}
     except Exception:
         pass
 
     # Fallback: use synchronous heuristic if no model or no odds
-    heur = _heuristic_from_odds(odds_list)
+    heur = _heuristic_from_odds(odds_list, history)
 
     return {
         'site': (site_or_url or 'global'),
         'odds': heur['odds'],
         'confidence': heur['confidence'],
-        'ts': int(time.time())
+        'ts': int(time.time()),
+        'history': history,
     }
 
 
@@ -0,0 +1,113 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """Admin-triggered CPU profiling of the running process.
+
+    Two modes: profile_for() profiles the whole event loop thread for a number of seconds,
+    and arm() profiles the next N runs of a supervisor job. Each profile is written as a
+    .prof file (load it with pstats or snakeviz) and summarized as the top pstats lines.
+
+    cProfile hooks the event loop thread, so coroutines interleaved with a profiled job run
+    show up in its profile too. Only one profile runs at a time; an armed job that becomes
+    due while another profile is active just runs unprofiled and stays armed. When nothing
+    is armed the supervisor pays a single dict truthiness check per run.
+    """
+
+    def __init__(self, out_dir: Optional[str] = None, keep: int = 20):
+        self.out_dir = out_dir or settings.PROFILE_DIR
+        self.armed: Dict[str, int] = {}
+        self.reports = deque(maxlen=keep)
+        self._active: Optional[str] = None
+
+    @property
+    def active(self) -> Optional[str]:
+        return self._active
+
+    def arm(self, job: str, runs: int = 1):
+        self.armed[job] = self.armed.get(job, 0) + max(1, int(runs))
+
+    def disarm(self, job: Optional[str] = None):
+        if job is None:
+            self.armed.clear()
+        else:
+            self.armed.pop(job, None)
+
+    def _report(self, prof: cProfile.Profile, label: str, wall: float, baseline: Optional[float], top: int) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        prof.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).strip_dirs().sort_stats('cumulative').print_stats(top)
+        report = {
+            'label': label,
+            'ts': int(time.time()),
+            'path': path,
+            'wall_seconds': round(wall, 4),
+            # cost of turning the profile into a report, paid after the profiled work
+            'report_seconds': round(time.perf_counter() - t0, 4),
+            'stats': out.getvalue(),
+        }
+        if baseline:
+            # profiled run vs the job's last unprofiled run
+            report['baseline_seconds'] = round(baseline, 4)
+            report['overhead_ratio'] = round(wall / baseline, 2)
+        self.reports.append(report)
+        logger.info("Profile %s written to %s (%.3fs)", label, path, wall)
+        return report
+
+    async def profile_for(self, seconds: float, top: int = 30) -> Dict[str, Any]:
+        if self._active:
+            raise RuntimeError(f"profile already running ({self._active})")
+        seconds = min(max(float(seconds), 0.1), settings.PROFILE_MAX_SECONDS)
+        self._active = 'process'
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+            self._active = None
+        return self._report(prof, 'process', time.perf_counter() - t0, None, top)
+
+    async def run_job(self, name: str, func: Callable[[], Awaitable[Any]], baseline: Optional[float] = None, top: int = 30):
+        """Run one job invocation, profiled when the job is armed and no other profile is active."""
+        if self._active or not self.armed.get(name):
+            return await func()
+        self.armed[name] -= 1
+        if not self.armed[name]:
+            del self.armed[name]
+        self._active = f"job:{name}"
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            return await func()
+        finally:
+            prof.disable()
+            self._active = None
+            self._report(prof, f"job-{name}", time.perf_counter() - t0, baseline, top)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'active': self._active,
+            'armed': dict(self.armed),
+            'reports': [{k: v for k, v in r.items() if k != 'stats'} for r in self.reports],
+        }
+
+
+# process-wide profiler used by the supervisor, /admin/profile and /profile
+profiler = Profiler()
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any
+from urllib.parse import urlsplit
+import httpx
+from .config import settings
+
+# target responses that mean the proxy itself is refused or throttled
+PROXY_FAILURE_STATUSES = {407, 429}
+
+
+def is_proxy_failure(exc: BaseException) -> bool:
+    """Whether an error counts against the proxy: connect errors, timeouts, 407 and 429.
+
+    Other status errors (403, 404, 5xx) come from the target site, which the proxy reached.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in PROXY_FAILURE_STATUSES
+    return isinstance(exc, (httpx.ConnectError, httpx.ProxyError, httpx.TimeoutException, asyncio.TimeoutError))
+
+
+def _mask(url: str) -> str:
+    """Hide credentials when reporting a proxy URL."""
+    parts = urlsplit(url)
+    if parts.username or parts.password:
+        host = parts.hostname or ''
+        if parts.port:
+            host = f"{host}:{parts.port}"
+        return f"{parts.scheme}://***@{host}"
+    return url
+
+
+class ProxyState:
+    LATENCY_ALPHA = 0.3  # weight of the newest sample in the latency EWMA
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.inflight = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.cooldowns = 0
+
+    def cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def has_capacity(self) -> bool:
+        return self.inflight < self.max_concurrency
+
+    def score(self) -> float:
+        # Laplace-smoothed success rate, penalised by average latency
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return success_rate / (1.0 + (self.latency_ewma or 0.0))
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            'proxy': _mask(self.url),
+            'inflight': self.inflight,
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'latency_ewma': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            'score': round(self.score(), 4),
+            'cooling_for': max(0.0, round(self.cooldown_until - now, 1)),
+            'cooldowns': self.cooldowns,
+        }
+
+
+class ProxyPool:
+    """Health-weighted proxy selection with per-proxy concurrency caps and per-host stickiness.
+
+    A host keeps using the proxy it was assigned while that proxy is healthy. Otherwise a
+    proxy is drawn at random weighted by score (success rate / latency) among proxies that
+    are not cooling down and have free slots. After PROXY_FAILURE_THRESHOLD consecutive
+    failures a proxy cools down for PROXY_COOLDOWN seconds.
+    """
+
+    def __init__(self, urls: List[str], max_concurrency: Optional[int] = None, cooldown: Optional[float] = None,
+                 failure_threshold: Optional[int] = None, clock=time.monotonic, rng: Optional[random.Random] = None):
+        max_concurrency = max_concurrency or settings.PROXY_MAX_CONCURRENCY
+        self.cooldown = settings.PROXY_COOLDOWN if cooldown is None else cooldown
+        self.failure_threshold = failure_threshold or settings.PROXY_FAILURE_THRESHOLD
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self.proxies = [ProxyState(u, max_concurrency) for u in dict.fromkeys(urls) if u]
+        self._sticky: Dict[str, ProxyState] = {}
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def choose(self, host: Optional[str] = None) -> Optional[ProxyState]:
+        if not self.proxies:
+            return None
+        now = self._clock()
+        sticky = self._sticky.get(host) if host else None
+        if sticky is not None and not sticky.cooling(now) and sticky.has_capacity():
+            return sticky
+        candidates = [p for p in self.proxies if not p.cooling(now) and p.has_capacity()]
+        if candidates:
+            chosen = self._rng.choices(candidates, weights=[p.score() for p in candidates])[0]
+        else:
+            # everything is busy or cooling: queue on the least loaded proxy that is not cooling,
+            # or the one whose cool-down ends first
+            warm = [p for p in self.proxies if not p.cooling(now)]
+            if warm:
+                chosen = min(warm, key=lambda p: p.inflight / p.max_concurrency)
+            else:
+                chosen = min(self.proxies, key=lambda p: p.cooldown_until)
+        if host:
+            self._sticky[host] = chosen
+        return chosen
+
+    def report(self, proxy: ProxyState, ok: bool, latency: float, host: Optional[str] = None):
+        if ok:
+            proxy.successes += 1
+            proxy.consecutive_failures = 0
+            a = ProxyState.LATENCY_ALPHA
+            proxy.latency_ewma = latency if proxy.latency_ewma is None else a * latency + (1 - a) * proxy.latency_ewma
+            return
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        if host and self._sticky.get(host) is proxy:
+            del self._sticky[host]
+        if proxy.consecutive_failures >= self.failure_threshold:
+            proxy.cooldown_until = self._clock() + self.cooldown
+            proxy.cooldowns += 1
+            proxy.consecutive_failures = 0
+
+    @asynccontextmanager
+    async def acquire(self, host: Optional[str] = None):
+        """Hold a slot on a chosen proxy; the outcome is recorded from what the block raised.
+
+        Proxy failures (see is_proxy_failure) count against the proxy, other status errors
+        count as a delivered response, and unrelated errors are not recorded.
+        """
+        proxy = self.choose(host)
+        if proxy is None:
+            yield None
+            return
+        async with proxy.semaphore:
+            proxy.inflight += 1
+            t0 = time.perf_counter()
+            try:
+                yield proxy
+            except Exception as e:
+                if is_proxy_failure(e):
+                    self.report(proxy, False, time.perf_counter() - t0, host)
+                elif isinstance(e, httpx.HTTPStatusError):
+                    self.report(proxy, True, time.perf_counter() - t0, host)
+                raise
+            else:
+                self.report(proxy, True, time.perf_counter() - t0, host)
+            finally:
+                proxy.inflight -= 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = self._clock()
+        return [p.snapshot(now) for p in self.proxies]
+
+
+def configured_proxy_urls() -> List[str]:
+    urls = [u.strip() for u in (settings.PROXY_URLS or '').split(',') if u.strip()]
+    if settings.PROXY_URL:
+        urls.append(settings.PROXY_URL)
+    return urls
+
+
+# process-wide pool used by scrapers.fetch_html
+proxy_pool = ProxyPool(configured_proxy_urls())
@@ -0,0 +1,184 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional, Iterator, Dict, Any, List
+from sqlalchemy import select, update, insert, delete
+from .db import Observation, ObservationSummary
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = 'observations-'
+ARCHIVE_SUFFIX = '.ndjson.gz'
+
+# progress of the current / last maintenance run (exposed on /metrics)
+RETENTION_STATS: Dict[str, Any] = {
+    'running': False,
+    'last_run_started': None,
+    'last_run_duration': None,
+    'last_cutoff': None,
+    'batches': 0,
+    'rows_archived': 0,
+    'rows_deleted': 0,
+    'summaries_written': 0,
+    'total_rows_deleted': 0,
+}
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def _day_of(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def archive_path(day: str, archive_dir: Optional[str] = None) -> str:
+    return os.path.join(archive_dir or settings.ARCHIVE_DIR, f"{ARCHIVE_PREFIX}{day}{ARCHIVE_SUFFIX}")
+
+
+def _write_archive(rows: List[Dict[str, Any]], archive_dir: Optional[str] = None):
+    """Append rows to their day's gzip file and fsync before the caller deletes them."""
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        by_day.setdefault(_day_of(r['ts']), []).append(r)
+    os.makedirs(archive_dir or settings.ARCHIVE_DIR, exist_ok=True)
+    for day, day_rows in by_day.items():
+        # each append is a new gzip member; gzip readers concatenate them transparently
+        with open(archive_path(day, archive_dir), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+                for r in day_rows:
+                    gz.write((json.dumps(r, separators=(',', ':')) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def iter_archived_observations(since: Optional[int] = None, until: Optional[int] = None, archive_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield archived observation dicts (id, site, odds, multiplier, ts) in day order.
+
+    Rows re-archived after an interrupted run are de-duplicated by id within their day file.
+    """
+    base = archive_dir or settings.ARCHIVE_DIR
+    if not os.path.isdir(base):
+        return
+    first_day = _day_of(since) if since is not None else None
+    last_day = _day_of(until) if until is not None else None
+    names = sorted(n for n in os.listdir(base) if n.startswith(ARCHIVE_PREFIX) and n.endswith(ARCHIVE_SUFFIX))
+    for name in names:
+        day = name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        seen = set()
+        with gzip.open(os.path.join(base, name), 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                r = json.loads(line)
+                if r.get('id') in seen:
+                    continue
+                seen.add(r.get('id'))
+                if since is not None and r['ts'] < since:
+                    continue
+                if until is not None and r['ts'] > until:
+                    continue
+                yield r
+
+
+def _summarize(rows: List[Dict[str, Any]], bucket_seconds: int) -> Dict[tuple, Dict[str, Any]]:
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        key = (r['site'], r['ts'] - r['ts'] % bucket_seconds)
+        b = buckets.setdefault(key, {'n_obs': 0, 'n_odds': 0, 'odds_sum': 0.0, 'odds_min': None, 'odds_max': None, 'n_labeled': 0, 'multiplier_sum': 0.0})
+        b['n_obs'] += 1
+        try:
+            odds = [float(o) for o in (json.loads(r['odds']) if r['odds'] else [])]
+        except Exception:
+            odds = []
+        if odds:
+            b['n_odds'] += len(odds)
+            b['odds_sum'] += sum(odds)
+            lo, hi = min(odds), max(odds)
+            b['odds_min'] = lo if b['odds_min'] is None else min(b['odds_min'], lo)
+            b['odds_max'] = hi if b['odds_max'] is None else max(b['odds_max'], hi)
+        if r['multiplier']:
+            try:
+                b['multiplier_sum'] += float(r['multiplier'])
+                b['n_labeled'] += 1
+            except ValueError:
+                pass
+    return buckets
+
+
+async def _upsert_summaries(conn, buckets: Dict[tuple, Dict[str, Any]]):
+    table = ObservationSummary.__table__
+    for (site, bucket_ts), b in buckets.items():
+        existing = (await conn.execute(
+            select(table).where(table.c.site == site, table.c.bucket_ts == bucket_ts)
+        )).mappings().first()
+        if existing is None:
+            await conn.execute(insert(table).values(site=site, bucket_ts=bucket_ts, **b))
+            continue
+        lo = [v for v in (existing['odds_min'], b['odds_min']) if v is not None]
+        hi = [v for v in (existing['odds_max'], b['odds_max']) if v is not None]
+        await conn.execute(update(table).where(table.c.id == existing['id']).values(
+            n_obs=(existing['n_obs'] or 0) + b['n_obs'],
+            n_odds=(existing['n_odds'] or 0) + b['n_odds'],
+            odds_sum=(existing['odds_sum'] or 0.0) + b['odds_sum'],
+            odds_min=min(lo) if lo else None,
+            odds_max=max(hi) if hi else None,
+            n_labeled=(existing['n_labeled'] or 0) + b['n_labeled'],
+            multiplier_sum=(existing['multiplier_sum'] or 0.0) + b['multiplier_sum'],
+        ))
+
+
+async def run_retention(now: Optional[int] = None, engine=None, archive_dir: Optional[str] = None, max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """Downsample, archive and delete raw observations older than RETENTION_RAW_DAYS.
+
+    Works in batches of RETENTION_BATCH_SIZE: rows are read, appended to the archive and
+    fsynced in a worker thread, then summarized and deleted in one short transaction.
+    """
+    engine = _get_engine(engine)
+    now = now or int(time.time())
+    cutoff = now - settings.RETENTION_RAW_DAYS * 86400
+    table = Observation.__table__
+    started = time.perf_counter()
+    RETENTION_STATS.update(running=True, last_run_started=now, last_cutoff=cutoff, batches=0, rows_archived=0, rows_deleted=0, summaries_written=0)
+    try:
+        while max_batches is None or RETENTION_STATS['batches'] < max_batches:
+            async with engine.connect() as conn:
+                rows = [dict(r) for r in (await conn.execute(
+                    select(table.c.id, table.c.site, table.c.odds, table.c.multiplier, table.c.ts)
+                    .where(table.c.ts < cutoff)
+                    .order_by(table.c.ts, table.c.id)
+                    .limit(settings.RETENTION_BATCH_SIZE)
+                )).mappings()]
+            if not rows:
+                break
+            # gzip + fsync would stall the event loop (and the bot) for the whole batch
+            await asyncio.to_thread(_write_archive, rows, archive_dir)
+            RETENTION_STATS['rows_archived'] += len(rows)
+            buckets = _summarize(rows, settings.RETENTION_BUCKET_SECONDS)
+            async with engine.begin() as conn:
+                await _upsert_summaries(conn, buckets)
+                await conn.execute(delete(table).where(table.c.id.in_([r['id'] for r in rows])))
+            RETENTION_STATS['batches'] += 1
+            RETENTION_STATS['rows_deleted'] += len(rows)
+            RETENTION_STATS['total_rows_deleted'] += len(rows)
+            RETENTION_STATS['summaries_written'] += len(buckets)
+            # yield the write lock to the collector between batches
+            await asyncio.sleep(settings.RETENTION_BATCH_PAUSE)
+    finally:
+        RETENTION_STATS['running'] = False
+        RETENTION_STATS['last_run_duration'] = round(time.perf_counter() - started, 3)
+    if RETENTION_STATS['rows_deleted']:
+        logger.info("Retention archived %s observations older than %s in %s batches",
+                    RETENTION_STATS['rows_deleted'], cutoff, RETENTION_STATS['batches'])
+    return dict(RETENTION_STATS)
+
@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import random
+import time
+from typing import Optional, List, Dict, Any, Iterable
+from .config import settings
+
+
+class AdaptiveScheduler:
+    """Priority-queue scheduler giving every site its own next-due time.
+
+    After each fetch the site's interval shrinks when its odds changed and grows when they
+    did not. Failures back off exponentially, expensive fetches are spaced out (interval is
+    at least cost * COLLECTION_COST_FACTOR) and every delay gets +/- jitter, all clamped to
+    [COLLECTION_MIN_INTERVAL, COLLECTION_MAX_INTERVAL].
+    """
+
+    SPEEDUP = 0.5  # multiplier applied when odds changed
+    SLOWDOWN = 1.5  # multiplier applied when odds were unchanged
+    MAX_FAILURE_EXP = 5
+
+    def __init__(self, sites: Iterable[str] = (), base_interval: Optional[float] = None, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, jitter: Optional[float] = None, clock=time.time, rng: Optional[random.Random] = None):
+        self.base_interval = float(base_interval or settings.COLLECTION_INTERVAL)
+        self.min_interval = float(min_interval or settings.COLLECTION_MIN_INTERVAL)
+        self.max_interval = float(max_interval or settings.COLLECTION_MAX_INTERVAL)
+        self.jitter = settings.COLLECTION_JITTER if jitter is None else jitter
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        for s in sites:
+            self.add(s)
+
+    def _clamp(self, value: float) -> float:
+        return max(self.min_interval, min(self.max_interval, value))
+
+    def _jittered(self, delay: float) -> float:
+        if not self.jitter:
+            return delay
+        return delay * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _push(self, site: str, due: float):
+        self._state[site]['next_due'] = due
+        heapq.heappush(self._heap, (due, next(self._seq), site))
+
+    def add(self, site: str, due: Optional[float] = None):
+        if site in self._state:
+            return
+        self._state[site] = {
+            'interval': self._clamp(self.base_interval), 'next_due': None, 'last_hash': None,
+            'failures': 0, 'changes': 0, 'unchanged': 0, 'runs': 0, 'last_cost': 0.0, 'last_run': None,
+        }
+        # spread first runs over a fraction of the interval to avoid a startup burst
+        now = self._clock()
+        self._push(site, due if due is not None else now + self._rng.uniform(0, self.jitter * self.min_interval))
+
+    def requeue(self, site: str, due: Optional[float] = None):
+        """Put a popped site back on the heap (due now by default) unless its run was recorded."""
+        st = self._state.get(site)
+        if st is not None and st['next_due'] is None:
+            self._push(site, self._clock() if due is None else due)
+
+    def remove(self, site: str):
+        # stale heap entries are skipped lazily in due_sites()
+        self._state.pop(site, None)
+
+    def due_sites(self, now: Optional[float] = None) -> List[str]:
+        """Pop and return every site whose next-due time has passed."""
+        now = self._clock() if now is None else now
+        out = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, site = heapq.heappop(self._heap)
+            st = self._state.get(site)
+            if st is None or st['next_due'] != due:
+                continue
+            st['next_due'] = None
+            out.append(site)
+        return out
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        now = self._clock() if now is None else now
+        while self._heap:
+            due, _, site = self._heap[0]
+            st = self._state.get(site)
+            if st is None or st['next_due'] != due:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due - now)
+        return None
+
+    def record(self, site: str, odds_hash: Optional[str] = None, cost: float = 0.0, ok: bool = True, now: Optional[float] = None) -> float:
+        """Update a site's interval from a fetch outcome and schedule its next run. Returns the delay."""
+        if site not in self._state:
+            self.add(site)
+        st = self._state[site]
+        now = self._clock() if now is None else now
+        st['runs'] += 1
+        st['last_cost'] = cost
+        st['last_run'] = now
+        if ok:
+            st['failures'] = 0
+            if st['last_hash'] is not None and odds_hash == st['last_hash']:
+                st['unchanged'] += 1
+                st['interval'] = self._clamp(st['interval'] * self.SLOWDOWN)
+            else:
+                st['changes'] += 1
+                st['interval'] = self._clamp(st['interval'] * self.SPEEDUP)
+            st['last_hash'] = odds_hash
+            delay = st['interval']
+        else:
+            st['failures'] += 1
+            delay = st['interval'] * (2 ** min(st['failures'], self.MAX_FAILURE_EXP))
+        delay = max(delay, cost * settings.COLLECTION_COST_FACTOR)
+        delay = self._clamp(self._jittered(self._clamp(delay)))
+        self._push(site, now + delay)
+        return delay
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        rows = []
+        for site, st in self._state.items():
+            rows.append({
+                'site': site,
+                'next_due': st['next_due'],
+                'interval': round(st['interval'], 1),
+                'failures': st['failures'],
+                'changes': st['changes'],
+                'unchanged': st['unchanged'],
+                'runs': st['runs'],
+                'last_cost': round(st['last_cost'], 3),
+                'last_run': st['last_run'],
+            })
+        rows.sort(key=lambda r: (r['next_due'] is None, r['next_due'] or 0))
+        return rows
@@ -1,64 +1,63 @@
 import time
 import logging
+from typing import Iterable, Optional, Set
+from sqlalchemy import select, update, insert
 from .db import AsyncSessionLocal, SiteBlacklist, AdminAlert
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
-async def record_failure(site: str):
-    now = int(time.time())
-    async with AsyncSessionLocal() as session:
-        row = (await session.execute(
-            "SELECT id, fail_count FROM site_blacklist WHERE site = :site",
-            {'site': site}
-        )).first()
-        # Use ORM-style upsert for portability
-        from sqlalchemy import select
-        q = await session.execute(select(SiteBlacklist).filter_by(site=site))
-        r = q.scalars().first()
-        if not r:
-            r = SiteBlacklist(site=site, fail_count=1, last_failure_ts=now)
-            session.add(r)
-        else:
-            r.fail_count = (r.fail_count or 0) + 1
-            r.last_failure_ts = now
-        # if threshold reached, blacklist
-        if r.fail_count >= settings.SCRAPE_FAILURE_THRESHOLD:
-            r.blacklisted_until = now + settings.BLACKLIST_DURATION
-            # create admin alert
-            msg = f"Site {site} added to blacklist after {r.fail_count} failures (until {r.blacklisted_until})."
-            alert = AdminAlert(message=msg, ts=now, sent=False)
-            session.add(alert)
-        await session.commit()
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
 
-async def reset_failures(site: str):
-    async with AsyncSessionLocal() as session:
-        from sqlalchemy import select
-        q = await session.execute(select(SiteBlacklist).filter_by(site=site))
-        r = q.scalars().first()
-        if r:
-            r.fail_count = 0
-            r.blacklisted_until = None
-            r.last_failure_ts = None
-            await session.commit()
 
-async def is_blacklisted(site: str) -> bool:
-    now = int(time.time())
-    async with AsyncSessionLocal() as session:
-        from sqlalchemy import select
-        q = await session.execute(select(SiteBlacklist).filter_by(site=site))
-        r = q.scalars().first()
-        if not r:
-            return False
-        if r.blacklisted_until and r.blacklisted_until > now:
-            return True
-        # expired
-        if r.blacklisted_until and r.blacklisted_until <= now:
-            r.blacklisted_until = None
-            r.fail_count = 0
-            await session.commit()
-            return False
-        return False
+async def blacklisted_sites(sites: Iterable[str], now: Optional[int] = None, engine=None) -> Set[str]:
+    """Sites currently blacklisted, read in one short transaction; expired entries are cleared."""
+    sites = list(sites)
+    if not sites:
+        return set()
+    now = now or int(time.time())
+    table = SiteBlacklist.__table__
+    async with _get_engine(engine).begin() as conn:
+        rows = (await conn.execute(
+            select(table.c.site, table.c.blacklisted_until)
+            .where(table.c.site.in_(sites), table.c.blacklisted_until.isnot(None))
+        )).all()
+        expired = [r.site for r in rows if r.blacklisted_until <= now]
+        if expired:
+            await conn.execute(update(table).where(table.c.site.in_(expired)).values(blacklisted_until=None, fail_count=0))
+    return {r.site for r in rows if r.blacklisted_until > now}
+
+
+async def record_outcomes(conn, failed: Iterable[str] = (), succeeded: Iterable[str] = (), now: Optional[int] = None):
+    """Apply a collect run's outcomes on an open connection, after the fetches.
+
+    Successes reset the failure count. Failures bump it and blacklist the site (with an
+    admin alert) once SCRAPE_FAILURE_THRESHOLD is reached.
+    """
+    now = now or int(time.time())
+    table = SiteBlacklist.__table__
+    succeeded = list(succeeded)
+    if succeeded:
+        await conn.execute(update(table).where(table.c.site.in_(succeeded))
+                           .values(fail_count=0, blacklisted_until=None, last_failure_ts=None))
+    for site in failed:
+        count = (await conn.execute(select(table.c.fail_count).where(table.c.site == site))).scalar()
+        if count is None:
+            count = 1
+            await conn.execute(insert(table).values(site=site, fail_count=count, last_failure_ts=now))
+        else:
+            count = (count or 0) + 1
+            await conn.execute(update(table).where(table.c.site == site).values(fail_count=count, last_failure_ts=now))
+        if count >= settings.SCRAPE_FAILURE_THRESHOLD:
+            until = now + settings.BLACKLIST_DURATION
+            await conn.execute(update(table).where(table.c.site == site).values(blacklisted_until=until))
+            msg = f"Site {site} added to blacklist after {count} failures (until {until})."
+            await conn.execute(insert(AdminAlert.__table__).values(message=msg, ts=now, sent=False))
+
 
 async def pop_unsent_alerts(limit: int = 10):
     async with AsyncSessionLocal() as session:
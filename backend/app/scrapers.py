@@ -1,10 +1,14 @@
 import logging
 import re
+import codecs
 import httpx
 import asyncio
+from urllib.parse import urlsplit, urlunsplit
 from bs4 import BeautifulSoup
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from .config import settings
+from .singleflight import SingleFlight
+from .proxy_pool import proxy_pool
 
 logger = logging.getLogger(__name__)
 
@@ -30,20 +34,119 @@ SITE_PATTERNS = {
     'MozzartBet': ['mozzartbet.com']
 }
 
+# concurrent fetch-and-parse of the same URL share one in-flight request
+url_flight = SingleFlight()
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36'
 }
 
 
-async def fetch_html(url: str, timeout: int = 10, retries: int = 3, backoff_base: float = 1.0, proxy: Optional[str] = None) -> Optional[str]:
+# per-site download counters: bytes read, bodies truncated at FETCH_MAX_BYTES, reads aborted early by a hook
+FETCH_STATS: Dict[str, Dict[str, int]] = {}
+
+
+def _record_fetch(url: str, nbytes: int, truncated: bool, aborted: bool):
+    key = identify_site_from_url(url) or urlsplit(url).hostname or url
+    st = FETCH_STATS.setdefault(key, {'fetches': 0, 'bytes': 0, 'truncated': 0, 'aborted': 0})
+    st['fetches'] += 1
+    st['bytes'] += nbytes
+    st['truncated'] += int(truncated)
+    st['aborted'] += int(aborted)
+
+
+class StopAfterBlock:
+    """Early-exit hook: stop reading once `end` appears after `start` (e.g. an embedded JSON odds block).
+
+    Called with each newly decoded piece. Only a short tail of the previous piece is kept so
+    a marker split across chunks is still found, and each chunk is searched once. Hooks are
+    stateful: fetch_html builds a fresh one per attempt from a factory.
+    """
+
+    def __init__(self, start: str, end: str = '</script>'):
+        self.start = start
+        self.end = end
+        self._tail = ''
+        self._started = False
+
+    @staticmethod
+    def _keep(text: str, marker: str) -> str:
+        n = len(marker) - 1
+        return text[-n:] if n > 0 else ''
+
+    def __call__(self, piece: str) -> bool:
+        text = self._tail + piece
+        if not self._started:
+            at = text.find(self.start)
+            if at < 0:
+                self._tail = self._keep(text, self.start)
+                return False
+            self._started = True
+            text = text[at + len(self.start):]
+        if self.end in text:
+            return True
+        self._tail = self._keep(text, self.end)
+        return False
+
+
+async def _get_text(url: str, timeout: int, proxy: Optional[str], max_bytes: Optional[int] = None,
+                    stop_when: Optional[Callable[[str], bool]] = None, transport=None) -> str:
+    """Stream the body, decoding incrementally; stop at max_bytes or when stop_when(piece) is true.
+
+    stop_when sees each newly decoded piece, so the body is joined only once at the end.
+    """
+    max_bytes = settings.FETCH_MAX_BYTES if max_bytes is None else max_bytes
+    async with httpx.AsyncClient(headers=HEADERS, timeout=timeout, proxies=proxy, transport=transport) as c:
+        async with c.stream('GET', url) as r:
+            r.raise_for_status()
+            try:
+                decoder = codecs.getincrementaldecoder(r.encoding or 'utf-8')(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            parts = []
+            nbytes = 0
+            truncated = aborted = False
+            async for chunk in r.aiter_bytes(settings.FETCH_CHUNK_SIZE):
+                if max_bytes and nbytes + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - nbytes]
+                    truncated = True
+                nbytes += len(chunk)
+                piece = decoder.decode(chunk)
+                parts.append(piece)
+                if truncated:
+                    break
+                if stop_when is not None and stop_when(piece):
+                    aborted = True
+                    break
+            parts.append(decoder.decode(b'', final=True))
+    _record_fetch(url, nbytes, truncated, aborted)
+    if truncated:
+        logger.warning("Response from %s truncated at %s bytes", url, nbytes)
+    return ''.join(parts)
+
+
+async def fetch_html(url: str, timeout: int = 10, retries: int = 3, backoff_base: float = 1.0, proxy: Optional[str] = None, pool=None,
+                     max_bytes: Optional[int] = None, stop_hook: Optional[Callable[[], Callable[[str], bool]]] = None,
+                     transport=None) -> Optional[str]:
+    """Fetch a page with retries and exponential back-off.
+
+    An explicit proxy is used as-is; otherwise each attempt leases a proxy from the pool
+    (sticky per host, health-weighted), or goes direct when no proxies are configured.
+    The body is streamed and capped at max_bytes (FETCH_MAX_BYTES by default, 0 = unlimited);
+    stop_hook is an optional factory for an early-exit hook (see StopAfterBlock); a fresh
+    hook is built for every attempt so a retry never inherits a failed attempt's state.
+    """
+    pool = proxy_pool if pool is None else pool
+    host = urlsplit(url).hostname
     attempt = 0
+    opts = {'max_bytes': max_bytes, 'transport': transport}
     while attempt <= retries:
+        opts['stop_when'] = stop_hook() if stop_hook is not None else None
         try:
-            transport = None
-            async with httpx.AsyncClient(headers=HEADERS, timeout=timeout, proxies=proxy) as c:
-                r = await c.get(url)
-                r.raise_for_status()
-                return r.text
+            if proxy is None and pool:
+                async with pool.acquire(host) as p:
+                    return await _get_text(url, timeout, p.url, **opts)
+            return await _get_text(url, timeout, proxy, **opts)
         except Exception as e:
             attempt += 1
             wait_time = backoff_base * (2 ** (attempt - 1))
@@ -84,6 +187,28 @@ def _parse_json_like_for_odds(html: str) -> list:
     return sorted(results, reverse=True)
 
 
+# Parser registry: site name -> parser(html) -> odds list. Dispatch is a dict lookup on the
+# site resolved from the URL's host; content sniffing is only a fallback for unknown pages.
+PARSERS: Dict[str, Callable[[str], list]] = {}
+# optional per-site early-exit hook factories for fetch_html (see StopAfterBlock)
+STOP_HOOKS: Dict[str, Callable[[], Callable[[str], bool]]] = {}
+# host -> site name, built from SITE_PATTERNS and extended by register_parser(hosts=...)
+HOST_INDEX: Dict[str, str] = {h: site for site, hosts in SITE_PATTERNS.items() for h in hosts}
+
+
+def register_parser(site: str, hosts: Optional[list] = None, stop_when: Optional[Callable[[], Callable[[str], bool]]] = None):
+    """Decorator registering a parser for a site (and optionally extra hosts or an early-exit hook factory)."""
+    def decorator(fn):
+        PARSERS[site] = fn
+        for h in hosts or []:
+            HOST_INDEX[h.lower()] = site
+        if stop_when is not None:
+            STOP_HOOKS[site] = stop_when
+        return fn
+    return decorator
+
+
+@register_parser('1xBet')
 def _parse_1xbet_html(html: str) -> list:
     """Heuristic parser for 1xBet pages: look into JSON-like blocks and common class names."""
     odds = set()
@@ -115,6 +240,7 @@ def _parse_1xbet_html(html: str) -> list:
     return sorted(odds, reverse=True)
 
 
+@register_parser('BetPawa')
 def _parse_betpawa_html(html: str) -> list:
     """Simple parser for BetPawa pages: looks for odds in data-attributes and decimal text."""
     odds = set()
@@ -137,6 +263,7 @@ def _parse_betpawa_html(html: str) -> list:
     return sorted(odds, reverse=True)
 
 
+@register_parser('SportyBet')
 def _parse_sportybet_html(html: str) -> list:
     """Heuristic parser for SportyBet: JSON payloads in scripts and visible odds."""
     odds = set()
@@ -158,23 +285,81 @@ def _parse_sportybet_html(html: str) -> list:
     return sorted(odds, reverse=True)
 
 
-async def extract_odds_from_html(html: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html, 'html.parser')
-    text = soup.get_text(separator=' ', strip=True)
+DEFAULT_ODDS_SELECTORS = '[data-odds], [data-price], [data-coef], [class*="odds" i], [class*="price" i], [class*="coef" i]'
+ODDS_ATTRIBUTES = ('data-odds', 'data-price', 'data-coef')
+
+
+def make_selector_parser(selectors: str = DEFAULT_ODDS_SELECTORS, attributes: tuple = ODDS_ATTRIBUTES) -> Callable[[str], list]:
+    """Build a parser reading odds from JSON-like script literals plus the given CSS selectors."""
+    def parse(html: str) -> list:
+        odds = set(_parse_json_like_for_odds(html))
+        soup = BeautifulSoup(html, 'html.parser')
+        for el in soup.select(selectors):
+            txt = next((el.get(a) for a in attributes if el.get(a)), None) or el.get_text() or ''
+            odds.update(_extract_numbers_from_text(txt))
+        if not odds:
+            odds.update(_extract_numbers_from_text(soup.get_text(separator=' ', strip=True)))
+        return sorted(odds, reverse=True)
+    return parse
+
+
+# Declarative parsers for the remaining SITE_PATTERNS entries: site -> CSS selectors.
+# Override an entry with site-specific selectors as layouts become known.
+SELECTOR_RULES: Dict[str, str] = {
+    'Bet365': DEFAULT_ODDS_SELECTORS,
+    'BetWay': DEFAULT_ODDS_SELECTORS,
+    'Betika': DEFAULT_ODDS_SELECTORS,
+    'MelBet': DEFAULT_ODDS_SELECTORS,
+    '1Win': DEFAULT_ODDS_SELECTORS,
+    'MeridianBet': DEFAULT_ODDS_SELECTORS,
+    'SpinCity': DEFAULT_ODDS_SELECTORS,
+    'Bet9ja': DEFAULT_ODDS_SELECTORS,
+    'Unibet': DEFAULT_ODDS_SELECTORS,
+    'William Hill': DEFAULT_ODDS_SELECTORS,
+    'Betclic': DEFAULT_ODDS_SELECTORS,
+    'Parimatch': DEFAULT_ODDS_SELECTORS,
+    'Betsafe': DEFAULT_ODDS_SELECTORS,
+    'Betfred': DEFAULT_ODDS_SELECTORS,
+    'MozzartBet': DEFAULT_ODDS_SELECTORS,
+}
 
-    # Prefer specialized parsers when detected
+for _site, _selectors in SELECTOR_RULES.items():
+    register_parser(_site)(make_selector_parser(_selectors))
+
+# content markers used only when the site cannot be resolved from the URL
+SNIFF_MARKERS = (('1xbet', '1xBet'), ('betpawa', 'BetPawa'), ('sportybet', 'SportyBet'))
+
+
+def _sniff_site(html: str) -> Optional[str]:
     lhtml = html.lower()
-    if '1xbet' in lhtml or '1xbet' in text.lower():
-        odds = _parse_1xbet_html(html)
-        return {'odds': odds, 'raw_text_sample': text[:500]}
-    if 'betpawa' in lhtml or 'betpawa' in text.lower():
-        odds = _parse_betpawa_html(html)
-        return {'odds': odds, 'raw_text_sample': text[:500]}
-    if 'sportybet' in lhtml or 'sportybet' in text.lower():
-        odds = _parse_sportybet_html(html)
-        return {'odds': odds, 'raw_text_sample': text[:500]}
+    for marker, site in SNIFF_MARKERS:
+        if marker in lhtml:
+            return site
+    return None
+
+
+# how much of the page is parsed for raw_text_sample when a registered parser handled it
+RAW_SAMPLE_PREFIX = 16384
+
+
+def _page_text(html: str) -> str:
+    return BeautifulSoup(html, 'html.parser').get_text(separator=' ', strip=True)
+
+
+async def extract_odds_from_html(html: str, site: Optional[str] = None) -> Dict[str, Any]:
+    """Extract odds with the parser registered for `site`, falling back to content sniffing, then generic extraction.
+
+    The full page is only turned into text on the generic fallback; registered parsers get
+    a raw_text_sample built from a bounded prefix of the page.
+    """
+    parser = PARSERS.get(site) if site else None
+    if parser is None:
+        parser = PARSERS.get(_sniff_site(html))
+    if parser is not None:
+        return {'odds': parser(html), 'raw_text_sample': _page_text(html[:RAW_SAMPLE_PREFIX])[:500]}
 
     # Generic extraction
+    text = _page_text(html)
     odds = _extract_numbers_from_text(text)
 
     # also look for JSON-like snippets
@@ -186,22 +371,71 @@ async def extract_odds_from_html(html: str) -> Dict[str, Any]:
     return {'odds': odds, 'raw_text_sample': text[:500]}
 
 
-async def get_site_odds_by_url(url: str) -> Dict[str, Any]:
-    html = await fetch_html(url, retries=settings.COLLECTION_RETRIES, backoff_base=settings.REQUEST_BACKOFF_BASE, proxy=(settings.PROXY_URL or None))
+def normalize_url(url: str) -> str:
+    """Canonical form used as the single-flight key: lowercase scheme/host, no default port, fragment or trailing slash."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and not ((scheme == 'http' and parts.port == 80) or (scheme == 'https' and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+async def _fetch_and_parse(url: str, stop_hook: Optional[Callable[[], Callable[[str], bool]]] = None) -> Dict[str, Any]:
+    site = identify_site_from_url(url)
+    if stop_hook is None:
+        stop_hook = STOP_HOOKS.get(site)
+    html = await fetch_html(url, retries=settings.COLLECTION_RETRIES, backoff_base=settings.REQUEST_BACKOFF_BASE, stop_hook=stop_hook)
     if not html:
         return {'odds': [], 'error': 'failed_fetch'}
-    data = await extract_odds_from_html(html)
+    data = await extract_odds_from_html(html, site=site)
     return data
 
 
-def identify_site_from_url(url: str) -> Optional[str]:
-    for site, patterns in SITE_PATTERNS.items():
-        for p in patterns:
-            if p in url:
-                return site
+async def get_site_odds_by_url(url: str, stop_hook: Optional[Callable[[], Callable[[str], bool]]] = None) -> Dict[str, Any]:
+    key = normalize_url(url)
+    data = await url_flight.do(key, lambda: _fetch_and_parse(url, stop_hook))
+    # callers share the result, so hand each one its own copy
+    return dict(data, odds=list(data.get('odds', [])))
+
+
+def site_for_host(host: Optional[str]) -> Optional[str]:
+    """Resolve a host to a site via HOST_INDEX, ignoring 'www.' and walking up to parent domains."""
+    if not host:
+        return None
+    host = host.lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    while host:
+        site = HOST_INDEX.get(host)
+        if site:
+            return site
+        _, _, host = host.partition('.')
+        if '.' not in host:
+            return None
     return None
 
 
+def identify_site_from_url(url: str) -> Optional[str]:
+    parts = urlsplit(url if '//' in url else '//' + url)
+    return site_for_host(parts.hostname)
+
+
+_SITE_NAMES = {s.lower(): s for s in SITE_PATTERNS}
+
+
+def canonical_site(text: Optional[str]) -> Optional[str]:
+    """Known site for user input (a site name in any case, or a URL/host of a known site), else None."""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return _SITE_NAMES.get(text.lower()) or identify_site_from_url(text)
+    except ValueError:  # unparseable URL
+        return None
+
+
 async def get_latest_odds(site_or_url: Optional[str]) -> Dict[str, Any]:
     """Try to fetch latest odds for a site name or URL. Returns {'site':..., 'odds': [...]}"""
     if not site_or_url:
@@ -210,13 +444,13 @@ async def get_latest_odds(site_or_url: Optional[str]) -> Dict[str, Any]:
     if site_or_url.startswith('http'):
         site = identify_site_from_url(site_or_url) or site_or_url
         data = await get_site_odds_by_url(site_or_url)
-        return {'site': site, 'odds': data.get('odds', []), 'raw': data.get('raw_text_sample')}
+        return {'site': site, 'odds': data.get('odds', []), 'raw': data.get('raw_text_sample'), 'error': data.get('error')}
     else:
         # Try to produce a common home page for the site name
         patterns = SITE_PATTERNS.get(site_or_url)
         if patterns:
             url = 'https://' + patterns[0]
             data = await get_site_odds_by_url(url)
-            return {'site': site_or_url, 'odds': data.get('odds', []), 'raw': data.get('raw_text_sample')}
+            return {'site': site_or_url, 'odds': data.get('odds', []), 'raw': data.get('raw_text_sample'), 'error': data.get('error')}
         return {'site': site_or_url, 'odds': []}
 
@@ -0,0 +1,162 @@
+import json
+import logging
+import time
+from typing import Dict, Any, Optional, List
+import numpy as np
+from sqlalchemy import select
+from .db import Observation
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# log-spaced histogram edges for the quantile sketch: odds 1.0 .. 1000 in 64 bins (~11% wide)
+SKETCH_EDGES = np.geomspace(1.0, 1000.0, 65)
+SKETCH_BINS = len(SKETCH_EDGES) - 1
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def _odds_value(odds) -> Optional[float]:
+    """Summary stored per observation: the mean of its odds list (None when it has no odds)."""
+    try:
+        vals = [float(o) for o in odds or []]
+    except (TypeError, ValueError):
+        return None
+    return sum(vals) / len(vals) if vals else None
+
+
+class RollingWindow:
+    """Fixed-size ring buffer of per-observation odds summaries for one site.
+
+    add() is O(1): running sum / sum of squares give mean and variance, and a log-binned
+    histogram (incremented for the new value, decremented for the evicted one) answers
+    quantiles to within one bin. The running sums are recomputed from the buffer every time
+    it wraps so float drift does not accumulate.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = np.zeros(size)
+        self.bins = np.zeros(size, dtype=np.int16)
+        self.hist = np.zeros(SKETCH_BINS, dtype=np.int64)
+        self.n = 0
+        self.pos = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.last_ts: Optional[int] = None
+
+    def add(self, value: float, ts: Optional[int] = None):
+        b = min(max(int(np.searchsorted(SKETCH_EDGES, value, side='right')) - 1, 0), SKETCH_BINS - 1)
+        if self.n == self.size:
+            old = self.values[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+            self.hist[self.bins[self.pos]] -= 1
+        else:
+            self.n += 1
+        self.values[self.pos] = value
+        self.bins[self.pos] = b
+        self.hist[b] += 1
+        self.total += value
+        self.total_sq += value * value
+        self.pos = (self.pos + 1) % self.size
+        if self.pos == 0:
+            self.total = float(self.values.sum())
+            self.total_sq = float((self.values * self.values).sum())
+        self.last_ts = ts or int(time.time())
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.n:
+            return 0.0
+        return max(self.total_sq / self.n - self.mean ** 2, 0.0) ** 0.5
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.n:
+            return None
+        target = q * self.n
+        cum = np.cumsum(self.hist)
+        b = min(int(np.searchsorted(cum, target, side='left')), SKETCH_BINS - 1)
+        before = cum[b] - self.hist[b]
+        frac = (target - before) / self.hist[b] if self.hist[b] else 0.0
+        # interpolate geometrically inside the bin
+        lo, hi = SKETCH_EDGES[b], SKETCH_EDGES[b + 1]
+        return float(lo * (hi / lo) ** min(max(frac, 0.0), 1.0))
+
+    def context(self) -> Dict[str, Any]:
+        return {
+            'n': self.n,
+            'mean': round(self.mean, 3),
+            'std': round(self.std, 3),
+            'p10': round(self.quantile(0.1), 2),
+            'p50': round(self.quantile(0.5), 2),
+            'p90': round(self.quantile(0.9), 2),
+            'last_ts': self.last_ts,
+        }
+
+
+class SiteStats:
+    """Per-site rolling windows fed by the collector and read by model_predict without DB access."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or settings.SITE_STATS_WINDOW
+        self._windows: Dict[str, RollingWindow] = {}
+
+    def record(self, site: Optional[str], odds, ts: Optional[int] = None):
+        value = _odds_value(odds)
+        if not site or value is None:
+            return
+        window = self._windows.get(site)
+        if window is None:
+            window = self._windows[site] = RollingWindow(self.size)
+        window.add(value, ts)
+
+    def context(self, site: Optional[str]) -> Optional[Dict[str, Any]]:
+        window = self._windows.get(site) if site else None
+        return window.context() if window is not None and window.n else None
+
+    async def rebuild(self, engine=None, sites: Optional[List[str]] = None) -> int:
+        """Load the newest `size` observations of every site; the new windows are swapped in at once."""
+        obs = Observation.__table__
+        windows: Dict[str, RollingWindow] = {}
+        loaded = 0
+        async with _get_engine(engine).connect() as conn:
+            if sites is None:
+                sites = [r[0] for r in await conn.execute(select(obs.c.site).where(obs.c.site.isnot(None)).distinct())]
+            for site in sites:
+                rows = (await conn.execute(
+                    select(obs.c.ts, obs.c.odds)
+                    .where(obs.c.site == site, obs.c.odds.isnot(None))
+                    .order_by(obs.c.ts.desc(), obs.c.id.desc())
+                    .limit(self.size)
+                )).all()
+                window = RollingWindow(self.size)
+                for ts, odds in reversed(rows):
+                    try:
+                        value = _odds_value(json.loads(odds))
+                    except ValueError:
+                        continue
+                    if value is not None:
+                        window.add(value, ts)
+                if window.n:
+                    windows[site] = window
+                    loaded += window.n
+        self._windows = windows
+        logger.info("Site stats rebuilt: %s observations over %s sites", loaded, len(windows))
+        return loaded
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {site: w.n for site, w in self._windows.items()}
+
+
+# process-wide windows (fed by tasks.collect_observations_for_sites)
+site_stats = SiteStats()
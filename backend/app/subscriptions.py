@@ -0,0 +1,173 @@
+import logging
+from typing import Dict, Set, List, Optional, Iterable
+from sqlalchemy import select, delete, insert, exists
+from .db import User, UserSite
+from .scrapers import SITE_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+# In-memory inverted index of subscribed users, kept current by /subscribe and /unsubscribe:
+# site -> chat ids, plus the users without preferred sites (they get the global signals).
+SITE_RECIPIENTS: Dict[str, Set[int]] = {}
+GLOBAL_RECIPIENTS: Set[int] = set()
+CHAT_LANG: Dict[int, str] = {}
+CHAT_DIGEST: Dict[int, bool] = {}
+_CHAT_SITES: Dict[int, Set[str]] = {}
+
+_CANONICAL = {s.lower(): s for s in SITE_PATTERNS}
+_MAX_NAME_WORDS = max(len(s.split()) for s in SITE_PATTERNS)
+
+
+def _get_engine(engine=None):
+    if engine is None:
+        from .db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def parse_sites(text: Optional[str]) -> List[str]:
+    """Split a free-text site list ("1xbet, BetPawa" or "1xbet William Hill") into canonical site names.
+
+    Unknown tokens (e.g. URLs) are kept as given.
+    """
+    if not text:
+        return []
+    out: List[str] = []
+    segments = text.split(',') if ',' in text else [text]
+    for seg in segments:
+        words = seg.split()
+        i = 0
+        while i < len(words):
+            # longest known multi-word name first ("William Hill")
+            for n in range(min(_MAX_NAME_WORDS, len(words) - i), 0, -1):
+                name = ' '.join(words[i:i + n])
+                if name.lower() in _CANONICAL:
+                    out.append(_CANONICAL[name.lower()])
+                    i += n
+                    break
+            else:
+                if ',' in text:
+                    # comma-separated input: keep unknown segments whole
+                    out.append(' '.join(words[i:]))
+                    i = len(words)
+                else:
+                    out.append(words[i])
+                    i += 1
+    return list(dict.fromkeys(out))
+
+
+def index_user(chat_id: int, lang: Optional[str], sites: Iterable[str], digest: Optional[bool] = True):
+    unindex_user(chat_id)
+    sites = set(sites)
+    CHAT_LANG[chat_id] = lang or 'en'
+    CHAT_DIGEST[chat_id] = digest is not False
+    _CHAT_SITES[chat_id] = sites
+    if not sites:
+        GLOBAL_RECIPIENTS.add(chat_id)
+    for s in sites:
+        SITE_RECIPIENTS.setdefault(s, set()).add(chat_id)
+
+
+def unindex_user(chat_id: int):
+    for s in _CHAT_SITES.pop(chat_id, set()):
+        recipients = SITE_RECIPIENTS.get(s)
+        if recipients is not None:
+            recipients.discard(chat_id)
+            if not recipients:
+                del SITE_RECIPIENTS[s]
+    GLOBAL_RECIPIENTS.discard(chat_id)
+    CHAT_LANG.pop(chat_id, None)
+    CHAT_DIGEST.pop(chat_id, None)
+
+
+def set_digest(chat_id: int, enabled: bool):
+    if chat_id in CHAT_LANG:
+        CHAT_DIGEST[chat_id] = enabled
+
+
+def clear_index():
+    SITE_RECIPIENTS.clear()
+    GLOBAL_RECIPIENTS.clear()
+    CHAT_LANG.clear()
+    CHAT_DIGEST.clear()
+    _CHAT_SITES.clear()
+
+
+async def set_user_sites(session, telegram_id: int, sites: Iterable[str]):
+    """Replace a user's rows in user_sites (caller commits)."""
+    table = UserSite.__table__
+    await session.execute(delete(table).where(table.c.telegram_id == telegram_id))
+    rows = [{'telegram_id': telegram_id, 'site': s} for s in dict.fromkeys(sites)]
+    if rows:
+        await session.execute(insert(table), rows)
+
+
+async def rebuild_index(engine=None, page_size: int = 500) -> int:
+    """Rebuild the in-memory index from the DB, streaming subscribed users in keyset pages.
+
+    The index is swapped in without awaiting in between, so a concurrent dispatch never sees
+    a half-built index.
+    """
+    engine = _get_engine(engine)
+    users = User.__table__
+    user_sites = UserSite.__table__
+    entries = []
+    last_id = 0
+    async with engine.connect() as conn:
+        while True:
+            page = (await conn.execute(
+                select(users.c.id, users.c.telegram_id, users.c.language, users.c.digest)
+                .where(users.c.subscribed == True, users.c.id > last_id)  # noqa: E712
+                .order_by(users.c.id)
+                .limit(page_size)
+            )).all()
+            if not page:
+                break
+            last_id = page[-1].id
+            sites_by_chat: Dict[int, List[str]] = {}
+            for tid, site in (await conn.execute(
+                select(user_sites.c.telegram_id, user_sites.c.site)
+                .where(user_sites.c.telegram_id.in_([r.telegram_id for r in page]))
+            )).all():
+                sites_by_chat.setdefault(tid, []).append(site)
+            entries.extend((r.telegram_id, r.language, sites_by_chat.get(r.telegram_id, []), r.digest) for r in page)
+    clear_index()
+    for entry in entries:
+        index_user(*entry)
+    logger.info("Subscriber index rebuilt: %s users, %s sites", len(entries), len(SITE_RECIPIENTS))
+    return len(entries)
+
+
+async def migrate_preferred_sites(engine=None, page_size: int = 500) -> int:
+    """Copy users.preferred_sites into user_sites for users that have no rows yet (idempotent)."""
+    engine = _get_engine(engine)
+    users = User.__table__
+    user_sites = UserSite.__table__
+    migrated = 0
+    last_id = 0
+    while True:
+        async with engine.begin() as conn:
+            page = (await conn.execute(
+                select(users.c.id, users.c.telegram_id, users.c.preferred_sites)
+                .where(
+                    users.c.id > last_id,
+                    users.c.preferred_sites.isnot(None),
+                    ~exists().where(user_sites.c.telegram_id == users.c.telegram_id),
+                )
+                .order_by(users.c.id)
+                .limit(page_size)
+            )).all()
+            if not page:
+                break
+            last_id = page[-1].id
+            rows = [{'telegram_id': r.telegram_id, 'site': s} for r in page for s in parse_sites(r.preferred_sites)]
+            if rows:
+                await conn.execute(insert(user_sites), rows)
+            migrated += len(page)
+    if migrated:
+        logger.info("Migrated preferred_sites of %s users into user_sites", migrated)
+    return migrated
+
+
+def index_stats() -> Dict[str, int]:
+    return {'users': len(CHAT_LANG), 'sites': len(SITE_RECIPIENTS), 'global_recipients': len(GLOBAL_RECIPIENTS)}
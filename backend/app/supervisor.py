@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Awaitable, Dict, Any, Optional, List
+from .profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]], interval: float, initial_delay: float = 0.0):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.initial_delay = float(initial_delay)
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.restarts = 0
+        self.overruns = 0
+        self.skipped_slots = 0
+        self.last_duration: Optional[float] = None
+        self.last_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run: Optional[float] = None  # loop time
+
+    def snapshot(self, loop_now: float, wall_now: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'restarts': self.restarts,
+            'overruns': self.overruns,
+            'skipped_slots': self.skipped_slots,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_started': self.last_started,
+            'last_error': self.last_error,
+            'next_run': round(wall_now + (self.next_run - loop_now), 1) if self.next_run is not None else None,
+        }
+
+
+class Supervisor:
+    """Owns the periodic background jobs.
+
+    Each job runs at a fixed rate: run k starts at start + k * interval, so the work's own
+    duration does not shift the schedule. Runs never overlap; a run that takes longer than
+    the interval counts as an overrun and the missed slots are skipped. A failing run is
+    retried after exponential back-off (capped at backoff_max) instead of killing the job,
+    and a job loop that dies anyway is restarted after the same back-off.
+    """
+
+    def __init__(self, backoff_base: float = 1.0, backoff_max: float = 300.0):
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jobs: Dict[str, Job] = {}
+        self._stopping = False
+
+    def add_job(self, name: str, func: Callable[[], Awaitable[Any]], interval: float, initial_delay: float = 0.0) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already registered")
+        job = Job(name, func, interval, initial_delay)
+        self.jobs[name] = job
+        return job
+
+    async def _run_job(self, job: Job):
+        loop = asyncio.get_running_loop()
+        job.next_run = loop.time() + job.initial_delay
+        while True:
+            await asyncio.sleep(max(0.0, job.next_run - loop.time()))
+            started = loop.time()
+            job.running = True
+            job.last_started = time.time()
+            try:
+                if profiler.armed:
+                    await profiler.run_job(job.name, job.func, job.last_duration)
+                else:
+                    await job.func()
+                job.consecutive_failures = 0
+                job.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                job.consecutive_failures += 1
+                job.last_error = repr(e)
+                logger.exception("Job %s failed (%s in a row)", job.name, job.consecutive_failures)
+            finally:
+                job.running = False
+                job.runs += 1
+                job.last_duration = loop.time() - started
+            now = loop.time()
+            if job.consecutive_failures:
+                job.next_run = now + self._backoff(job.consecutive_failures)
+                continue
+            job.next_run += job.interval
+            if job.next_run <= now:
+                missed = int((now - job.next_run) // job.interval) + 1
+                job.overruns += 1
+                job.skipped_slots += missed
+                job.next_run += missed * job.interval
+                logger.warning("Job %s overran its %ss interval (took %.2fs), skipping %s slot(s)",
+                               job.name, job.interval, job.last_duration, missed)
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** (failures - 1)))
+
+    def _spawn(self, job: Job):
+        if self._stopping:
+            return
+        job.task = asyncio.create_task(self._run_job(job))
+        job.task.add_done_callback(lambda t, j=job: self._on_done(j, t))
+
+    def _on_done(self, job: Job, task: asyncio.Task):
+        if self._stopping or task.cancelled():
+            return
+        exc = task.exception()
+        if exc is None:
+            return
+        job.restarts += 1
+        delay = self._backoff(job.restarts)
+        logger.error("Job %s loop crashed with %r, restarting in %ss", job.name, exc, delay)
+        asyncio.get_running_loop().call_later(delay, self._spawn, job)
+
+    def start(self):
+        self._stopping = False
+        for job in self.jobs.values():
+            if job.task is None or job.task.done():
+                self._spawn(job)
+        logger.info("Supervisor started jobs: %s", ', '.join(f"{j.name}@{j.interval}s" for j in self.jobs.values()))
+
+    async def stop(self):
+        self._stopping = True
+        tasks: List[asyncio.Task] = [j.task for j in self.jobs.values() if j.task and not j.task.done()]
+        for t in tasks:
+            t.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for job, res in zip([j for j in self.jobs.values() if j.task in tasks], results):
+            if isinstance(res, Exception) and not isinstance(res, asyncio.CancelledError):
+                logger.error("Job %s ended with %r", job.name, res)
+        for job in self.jobs.values():
+            job.task = None
+            job.running = False
+            job.next_run = None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        try:
+            loop_now = asyncio.get_running_loop().time()
+        except RuntimeError:
+            loop_now = time.monotonic()
+        wall_now = time.time()
+        return [j.snapshot(loop_now, wall_now) for j in self.jobs.values()]
@@ -1,54 +1,123 @@
 import asyncio
 import time
 import json
+import hashlib
 import logging
-from .scrapers import get_latest_odds, identify_site_from_url
-from .db import AsyncSessionLocal, Observation
+from typing import Optional
+from .scrapers import get_latest_odds
+from .scraper_state import blacklisted_sites, record_outcomes
+from .ingest import observation_buffer
+from .odds_cache import odds_snapshots
+from .site_stats import site_stats
+from .scheduler import AdaptiveScheduler
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
-async def collect_observations_for_sites(sites):
+# per-site schedule used by the collect job (exposed on /schedule)
+collection_scheduler = AdaptiveScheduler()
+
+
+def _odds_hash(odds) -> str:
+    return hashlib.sha1(json.dumps(odds, sort_keys=True).encode()).hexdigest()
+
+async def collect_observations_for_sites(sites, engine=None):
+    """Scrape each site and hand the observation to the write-behind buffer.
+
+    No DB work is interleaved with the network-bound fetches: the blacklist is read once
+    before them, and failure counts and shared snapshots are written in one short
+    transaction after them. Observation rows go through the buffer.
+    """
     results = []
-    async with AsyncSessionLocal() as session:
-        for s in sites:
-            try:
-                # skip blacklisted sites
-                from .scraper_state import is_blacklisted, record_failure, reset_failures
-                if await is_blacklisted(s):
-                    logger.info("Skipping blacklisted site %s", s)
-                    results.append({'site': s, 'odds_count': 0, 'skipped': True})
-                    continue
-                # use configured retries/backoff/proxy
-                data = await get_latest_odds(s)
-                if data.get('error'):
-                    logger.warning("Collection returned error for %s: %s", s, data.get('error'))
-                    await record_failure(s)
-                else:
-                    await reset_failures(s)
-                obs = Observation(site=data.get('site') or s, odds=json.dumps(data.get('odds', [])), multiplier=None, ts=int(time.time()))
-                session.add(obs)
-                results.append({'site': obs.site, 'odds_count': len(data.get('odds', []))})
-            except Exception as e:
-                logger.exception("Failed to collect for %s: %s", s, e)
-        await session.commit()
+    failed, succeeded = [], []
+    if engine is None:
+        from .db import engine
+    try:
+        blocked = await blacklisted_sites(sites, engine=engine)
+    except Exception:
+        logger.exception("Failed to read the site blacklist")
+        blocked = set()
+    for s in sites:
+        try:
+            # skip blacklisted sites
+            if s in blocked:
+                logger.info("Skipping blacklisted site %s", s)
+                results.append({'site': s, 'odds_count': 0, 'skipped': True})
+                continue
+            # use configured retries/backoff/proxy
+            t0 = time.monotonic()
+            data = await get_latest_odds(s)
+            elapsed = time.monotonic() - t0
+            if data.get('error'):
+                logger.warning("Collection returned error for %s: %s", s, data.get('error'))
+                failed.append(s)
+            else:
+                succeeded.append(s)
+                odds_snapshots.put(s, data)
+                site_stats.record(data.get('site') or s, data.get('odds'))
+            site = data.get('site') or s
+            await observation_buffer.add(site, json.dumps(data.get('odds', [])), multiplier=None, ts=int(time.time()))
+            results.append({'site': site, 'odds_count': len(data.get('odds', [])), 'odds_hash': _odds_hash(data.get('odds', [])),
+                            'elapsed': elapsed, 'error': data.get('error')})
+        except Exception as e:
+            logger.exception("Failed to collect for %s: %s", s, e)
+    if failed or succeeded:
+        try:
+            async with engine.begin() as conn:
+                await record_outcomes(conn, failed, succeeded)
+                await odds_snapshots.publish_many(succeeded, conn)
+        except Exception:
+            logger.exception("Failed to record collection outcomes for %s", failed + succeeded)
     return results
 
 
-async def collect_loop(app):
-    """Continuously collect observations for SUPPORTED_SITES"""
+async def _collect_and_reschedule(site: str, scheduler: AdaptiveScheduler):
+    """Collect one site and feed the outcome back into the scheduler (a raise counts as a failure)."""
+    try:
+        res = await collect_observations_for_sites([site])
+    except Exception:
+        # keep the site backing off instead of leaving it due on every tick
+        scheduler.record(site, ok=False)
+        raise
+    r = res[0] if res else None
+    ok = bool(r) and not r.get('skipped') and not r.get('error')
+    scheduler.record(site, odds_hash=r.get('odds_hash') if r else None, cost=(r or {}).get('elapsed', 0.0), ok=ok)
+
+
+async def collect_due_sites(scheduler: AdaptiveScheduler = None, concurrency: Optional[int] = None) -> int:
+    """One collect job run: collect every SUPPORTED_SITES entry whose adaptive schedule is due.
+
+    Due sites are collected concurrently, at most `concurrency` (COLLECTION_CONCURRENCY) at
+    a time, so a tick with several due sites fits in COLLECTION_TICK instead of overrunning.
+    """
     from .bot import SUPPORTED_SITES
-    interval = settings.COLLECTION_INTERVAL
-    while True:
+    scheduler = scheduler or collection_scheduler
+    for s in SUPPORTED_SITES:
+        scheduler.add(s)
+    due = scheduler.due_sites()
+    slots = asyncio.Semaphore(max(1, concurrency or settings.COLLECTION_CONCURRENCY))
+
+    async def collect(site: str):
         try:
-            await collect_observations_for_sites(SUPPORTED_SITES)
-        except Exception as e:
-            logger.exception("Error in collect_loop: %s", e)
-        await asyncio.sleep(interval)
+            async with slots:
+                await _collect_and_reschedule(site, scheduler)
+        finally:
+            # a run cancelled mid-fetch (supervisor stop, demotion) never reaches record();
+            # without this the popped site would never be due again
+            scheduler.requeue(site)
+
+    results = await asyncio.gather(*(collect(site) for site in due), return_exceptions=True)
+    for site, res in zip(due, results):
+        if isinstance(res, Exception):
+            logger.error("Collect failed for %s: %r", site, res)
+    return len(due)
 
 
 async def collect_now(sites=None):
     if not sites:
         from .bot import SUPPORTED_SITES
         sites = SUPPORTED_SITES
-    return await collect_observations_for_sites(sites)
+    res = await collect_observations_for_sites(sites)
+    # admin-triggered runs should be visible to /stats straight away
+    await observation_buffer.flush()
+    return res
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+from telegram import Update
+from telegram.ext import Application
+
+# handler latency and in-flight counters (exposed on /metrics)
+UPDATE_STATS: Dict[str, Any] = {
+    'inflight': 0,
+    'max_inflight': 0,
+    'processed': 0,
+    'latency_total': 0.0,
+    'latency_max': 0.0,
+    'last_latency': 0.0,
+}
+
+
+def update_stats() -> Dict[str, Any]:
+    n = UPDATE_STATS['processed']
+    return dict(UPDATE_STATS, latency_avg=round(UPDATE_STATS['latency_total'] / n, 4) if n else 0.0)
+
+
+def _chat_key(update: object) -> Optional[int]:
+    if isinstance(update, Update) and update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedApplication(Application):
+    """Application that processes updates concurrently but keeps each chat's updates in order.
+
+    With concurrent_updates enabled, PTB starts every update as its own task in queue order.
+    Here each task first takes its chat's lock; asyncio.Lock wakes waiters FIFO, so updates
+    from one chat run one at a time in arrival order while other chats proceed in parallel.
+
+    PTB acquires its concurrency semaphore before process_update, so updates queued behind a
+    busy chat would hold slots and one flooding chat could stall everyone. The cap is
+    therefore enforced here, after the chat lock, and PTB's own semaphore is made unbounded.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = {}
+        self._handler_slots = asyncio.Semaphore(self._concurrent_updates or 1)
+        # waiting tasks are cheap; only running handlers count against concurrent_updates
+        self._concurrent_updates_sem = asyncio.BoundedSemaphore(2 ** 30)
+
+    async def _process_timed(self, update: object):
+        async with self._handler_slots:
+            await self._process_counted(update)
+
+    async def _process_counted(self, update: object):
+        UPDATE_STATS['inflight'] += 1
+        UPDATE_STATS['max_inflight'] = max(UPDATE_STATS['max_inflight'], UPDATE_STATS['inflight'])
+        t0 = time.perf_counter()
+        try:
+            await super().process_update(update)
+        finally:
+            elapsed = time.perf_counter() - t0
+            UPDATE_STATS['inflight'] -= 1
+            UPDATE_STATS['processed'] += 1
+            UPDATE_STATS['latency_total'] += elapsed
+            UPDATE_STATS['latency_max'] = max(UPDATE_STATS['latency_max'], elapsed)
+            UPDATE_STATS['last_latency'] = round(elapsed, 4)
+
+    async def process_update(self, update: object) -> None:
+        key = _chat_key(update)
+        if key is None:
+            return await self._process_timed(update)
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                await self._process_timed(update)
+        finally:
+            self._chat_waiters[key] -= 1
+            if not self._chat_waiters[key]:
+                # drop idle chats so the lock table does not grow with the user base
+                del self._chat_waiters[key]
+                self._chat_locks.pop(key, None)
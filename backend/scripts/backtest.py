@@ -0,0 +1,31 @@
+"""Backtest the predictor strategies against the collected observation history.
+
+Replays every registered strategy (heuristic, seeded, model, ...) over labeled
+observations, one rolling time window at a time, and prints error metrics, confidence
+calibration and throughput.
+
+Usage: python scripts/backtest.py [--strategy heuristic] [--site 1xBet] [--since TS] [--until TS] [--window 86400] [--windows]
+"""
+import argparse
+import asyncio
+import json
+from app.backtest import run_backtest, STRATEGIES
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--strategy', action='append', choices=sorted(STRATEGIES), help='repeatable, default: all')
+    parser.add_argument('--site', action='append', help='repeatable, default: every site with labeled rows')
+    parser.add_argument('--since', type=int, help='unix timestamp (inclusive)')
+    parser.add_argument('--until', type=int, help='unix timestamp (exclusive)')
+    parser.add_argument('--window', type=int, default=86400, help='window length in seconds')
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('--windows', action='store_true', help='include per-window MAE in the report')
+    args = parser.parse_args()
+    report = await run_backtest(args.strategy, args.site, args.since, args.until, args.window,
+                                page_size=args.page_size, keep_windows=args.windows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Concurrent read/write benchmark for the SQLite profile in app.db.
+
+Replays our real access pattern against a scratch database, once with the
+default engine and once with the tuned profile:
+- a collector writing one observation per site per cycle (plus blacklist updates)
+- the signal dispatcher scanning subscribed users
+- /stats counting the last 24h of observations
+
+Usage: python scripts/bench_db.py [--seconds 10] [--readers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import select, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import make_engine, Base, User, Observation, SiteBlacklist
+from app.scrapers import SITE_PATTERNS
+
+SITES = list(SITE_PATTERNS.keys())
+
+
+async def _seed(Session, users: int = 500, observations: int = 20000):
+    now = int(time.time())
+    async with Session() as session:
+        for i in range(users):
+            session.add(User(telegram_id=i + 1, subscribed=(i % 2 == 0), language='en', preferred_sites=','.join(random.sample(SITES, 3))))
+        for i in range(observations):
+            session.add(Observation(site=random.choice(SITES), odds=json.dumps([1.5, 2.1, 3.4]), multiplier=None, ts=now - random.randint(0, 48 * 3600)))
+        await session.commit()
+
+
+async def _collector(Session, stop_at: float, counters: dict):
+    while time.monotonic() < stop_at:
+        async with Session() as session:
+            now = int(time.time())
+            for s in SITES:
+                session.add(Observation(site=s, odds=json.dumps([round(random.uniform(1.01, 5), 2) for _ in range(5)]), multiplier=None, ts=now))
+            await session.commit()
+        # blacklist bookkeeping opens its own short session per site
+        async with Session() as session:
+            r = (await session.execute(select(SiteBlacklist).filter_by(site=SITES[0]))).scalars().first()
+            if not r:
+                session.add(SiteBlacklist(site=SITES[0], fail_count=0))
+            else:
+                r.fail_count = (r.fail_count or 0) + 1
+            await session.commit()
+        counters['writes'] += len(SITES)
+
+
+async def _dispatcher_reader(Session, stop_at: float, counters: dict):
+    while time.monotonic() < stop_at:
+        async with Session() as session:
+            rows = (await session.execute(select(User).filter_by(subscribed=True))).scalars().all()
+            for u in rows:
+                _ = [s.strip() for s in (u.preferred_sites or '').split(',') if s.strip()]
+        counters['reads'] += 1
+
+
+async def _stats_reader(Session, stop_at: float, counters: dict):
+    while time.monotonic() < stop_at:
+        cutoff = int(time.time()) - 24 * 3600
+        async with Session() as session:
+            await session.execute(select(Observation.site, func.count()).filter(Observation.ts >= cutoff).group_by(Observation.site))
+        counters['reads'] += 1
+
+
+async def run_profile(tuned: bool, seconds: float, readers: int) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix='bench_db_')
+    url = f"sqlite+aiosqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    engine = make_engine(url, tuned=tuned)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await _seed(Session)
+    counters = {'writes': 0, 'reads': 0, 'errors': 0}
+    stop_at = time.monotonic() + seconds
+
+    async def guarded(coro):
+        try:
+            await coro
+        except Exception:
+            counters['errors'] += 1
+
+    tasks = [guarded(_collector(Session, stop_at, counters))]
+    for i in range(readers):
+        reader = _dispatcher_reader if i % 2 == 0 else _stats_reader
+        tasks.append(guarded(reader(Session, stop_at, counters)))
+    t0 = time.monotonic()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - t0
+    await engine.dispose()
+    return {
+        'profile': 'tuned' if tuned else 'default',
+        'writes_per_sec': round(counters['writes'] / elapsed, 1),
+        'reads_per_sec': round(counters['reads'] / elapsed, 1),
+        'errors': counters['errors'],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+    for tuned in (False, True):
+        print(await run_profile(tuned, args.seconds, args.readers))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
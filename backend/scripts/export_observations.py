@@ -0,0 +1,39 @@
+"""Stream observations out of the database as NDJSON or CSV.
+
+Rows are read in keyset pages on (ts, id), so memory stays flat however large the export.
+
+Usage: python scripts/export_observations.py [--format ndjson|csv] [--site 1xBet] [--since TS] [--until TS] [--gzip] [--out FILE]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from app.export import export_observations, FORMATS
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson')
+    parser.add_argument('--site', action='append', help='repeatable, default: all sites')
+    parser.add_argument('--since', type=int, help='unix timestamp (inclusive)')
+    parser.add_argument('--until', type=int, help='unix timestamp (exclusive)')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('--out', help='output file, default: stdout')
+    args = parser.parse_args()
+    out = open(args.out, 'wb') if args.out else sys.stdout.buffer
+    t0 = time.perf_counter()
+    written = 0
+    try:
+        async for chunk in export_observations(args.format, args.gzip, sites=args.site, since=args.since,
+                                               until=args.until, page_size=args.page_size):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.out:
+            out.close()
+    print(f"wrote {written} bytes in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
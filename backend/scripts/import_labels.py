@@ -0,0 +1,28 @@
+"""Import crash multipliers from a CSV or NDJSON file of (site, ts, multiplier) records.
+
+Each label is attached to the nearest observation of the same site within --tolerance
+seconds. Files may be gzip-compressed (.csv.gz, .ndjson.gz).
+
+Usage: python scripts/import_labels.py labels.csv [--tolerance 30] [--chunk-size 50000] [--insert-unmatched] [--keep-existing]
+"""
+import argparse
+import asyncio
+import json
+from app.labels import import_labels
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--tolerance', type=int, default=30, help='max seconds between label and observation')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='labels per transaction')
+    parser.add_argument('--insert-unmatched', action='store_true', help='insert labels without a matching observation')
+    parser.add_argument('--keep-existing', action='store_true', help='do not overwrite multipliers already set')
+    args = parser.parse_args()
+    stats = await import_labels(args.path, tolerance=args.tolerance, chunk_size=args.chunk_size,
+                                insert_unmatched=args.insert_unmatched, overwrite=not args.keep_existing)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
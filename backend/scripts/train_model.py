@@ -1,14 +1,37 @@
+"""Train the crash-multiplier model from labeled observations.
+
+Usage: python scripts/train_model.py [--per-site] [--workers N] [--include-archive]
+"""
+import argparse
 import asyncio
-import sys
+import json
 from app import model
 
+NO_DATA = "No labeled observations found. Please collect observations with 'multiplier' field populated."
+
+
 async def main():
-    X, y = await model.load_dataset()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-site', action='store_true', help='one model per site plus a global fallback')
+    parser.add_argument('--workers', type=int, default=None, help='processes used with --per-site (default: CPU count)')
+    parser.add_argument('--include-archive', action='store_true', help='also read rows moved to the retention archive (single model only)')
+    args = parser.parse_args()
+    if args.per_site:
+        # one model per site plus a global fallback, fitted in parallel processes
+        datasets = await model.load_site_datasets()
+        if not datasets:
+            print(NO_DATA)
+            return
+        res = await asyncio.get_running_loop().run_in_executor(None, lambda: model.train_per_site(datasets, max_workers=args.workers))
+        print(json.dumps(res, indent=2))
+        return
+    X, y = await model.load_dataset(include_archive=args.include_archive)
     if len(X) == 0:
-        print("No labeled observations found. Please collect observations with 'multiplier' field populated.")
+        print(NO_DATA)
         return
     res = model.train_and_save(X, y)
     print(res)
 
+
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import random
+import numpy as np
+import pytest
+from sqlalchemy import insert
+from app.db import Base, Observation, make_engine
+from app import backtest
+from app.backtest import Batch, run_backtest, register_strategy, STRATEGIES
+from app.predictor import _heuristic_from_odds
+
+
+def _rows(n, start=0, step=600):
+    rnd = random.Random(1)
+    rows = []
+    for i in range(n):
+        odds = [round(1 + rnd.random() * 4, 2) for _ in range(rnd.randint(0, 5))]
+        rows.append({'site': 'A', 'odds': json.dumps(odds), 'multiplier': str(round(1 + rnd.random() * 3, 2)), 'ts': start + i * step})
+    return rows
+
+
+def test_vectorized_heuristic_matches_predictor():
+    rows = _rows(200)
+    batch = Batch.from_rows('A', [(r['ts'], r['odds'], r['multiplier']) for r in rows])
+    odds, conf = STRATEGIES['heuristic'](batch, {})
+    for i, r in enumerate(rows):
+        lst = json.loads(r['odds'])
+        if not lst:
+            assert conf[i] == 35
+            continue
+        expected = _heuristic_from_odds(lst)
+        # np.round and round() may disagree on exact half-cent ties
+        assert odds[i] == pytest.approx(expected['odds'], abs=0.0101)
+        assert conf[i] == expected['confidence']
+
+
+def test_backtest_streams_windows_and_reports_metrics(tmp_path):
+    rows = _rows(300)  # 300 rows, 10 minutes apart: a bit over two days
+    rows.append({'site': 'A', 'odds': '[2.0]', 'multiplier': None, 'ts': 10})  # unlabeled, ignored
+
+    @register_strategy('always_two')
+    def always_two(batch, state):
+        state['calls'] = state.get('calls', 0) + 1
+        return np.full(len(batch), 2.0), np.full(len(batch), 80.0)
+
+    @register_strategy('broken')
+    def broken(batch, state):
+        raise ValueError('boom')
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'bt.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Observation.__table__), rows)
+        try:
+            return await run_backtest(['heuristic', 'seeded', 'always_two', 'broken'], window=86400,
+                                      engine=engine, page_size=37, keep_windows=True)
+        finally:
+            await engine.dispose()
+
+    try:
+        report = asyncio.run(run())
+    finally:
+        STRATEGIES.pop('always_two')
+        STRATEGIES.pop('broken')
+    assert report['rows'] == 300
+    assert [w['n'] for w in report['windows']] == [144, 144, 12]
+    assert 'broken' in report['failed']
+    two = report['strategies']['always_two']
+    actual = np.array([float(r['multiplier']) for r in rows[:300]])
+    assert two['n'] == 300
+    assert two['mae'] == pytest.approx(np.abs(2.0 - actual).mean(), abs=1e-4)
+    assert two['bias'] == pytest.approx((2.0 - actual).mean(), abs=1e-4)
+    assert two['hit_rate'] == pytest.approx((actual >= 2.0).mean(), abs=1e-4)
+    assert two['calibration'][0]['confidence'] == '80-90'
+    assert report['strategies']['heuristic']['n'] == 300
+    assert report['sites']['A']['seeded']['n'] == 300
+    assert report['strategies']['seeded']['vectorized'] is False
+
+
+def test_unknown_strategy_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(run_backtest(['nope'], sites=[]))
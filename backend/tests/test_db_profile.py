@@ -0,0 +1,88 @@
+import asyncio
+from sqlalchemy import text
+from app.db import make_engine
+
+
+def test_tuned_engine_applies_pragmas(tmp_path):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}")
+        async with engine.connect() as conn:
+            journal = (await conn.execute(text('PRAGMA journal_mode'))).scalar()
+            sync = (await conn.execute(text('PRAGMA synchronous'))).scalar()
+            busy = (await conn.execute(text('PRAGMA busy_timeout'))).scalar()
+        await engine.dispose()
+        return journal, sync, busy
+
+    journal, sync, busy = asyncio.run(run())
+    assert journal == 'wal'
+    assert sync == 1  # NORMAL
+    assert busy == 5000
+
+
+def test_default_engine_keeps_rollback_journal(tmp_path):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'plain.db'}", tuned=False)
+        async with engine.connect() as conn:
+            journal = (await conn.execute(text('PRAGMA journal_mode'))).scalar()
+        await engine.dispose()
+        return journal
+
+    assert asyncio.run(run()) == 'delete'
+
+
+def test_add_missing_columns_upgrades_existing_table(tmp_path):
+    from app.db import Base, add_missing_columns
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text('CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL)'))
+            await conn.execute(text('INSERT INTO users (telegram_id) VALUES (7)'))
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(add_missing_columns)
+            digest = (await conn.execute(text('SELECT digest FROM users'))).scalar()
+        await engine.dispose()
+        return digest
+
+    assert asyncio.run(run()) == 1
+
+
+def test_migrations_tolerate_a_worker_that_migrated_first(tmp_path, monkeypatch):
+    from app import db
+    real_inspect = db.inspect
+    stale = []
+
+    class StaleInspector:
+        """What a second worker saw before the first one migrated."""
+
+        def __init__(self, insp):
+            self._insp = insp
+
+        def __getattr__(self, name):
+            return getattr(self._insp, name)
+
+        def get_columns(self, table):
+            cols = self._insp.get_columns(table)
+            return [c for c in cols if c['name'] != 'digest'] if table == 'users' else cols
+
+        def get_indexes(self, table):
+            return [i for i in self._insp.get_indexes(table) if i['name'] != 'ix_observations_ts_id']
+
+    def inspect(conn):
+        # only the first inspection of each run is stale
+        stale.append(1)
+        return StaleInspector(real_inspect(conn)) if len(stale) == 1 else real_inspect(conn)
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'race.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text('CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL)'))
+            await conn.run_sync(db.Base.metadata.create_all)
+            await conn.run_sync(db.add_missing_columns)
+            monkeypatch.setattr(db, 'inspect', inspect)
+            await conn.run_sync(db.add_missing_columns)
+            stale.clear()
+            await conn.run_sync(db.add_missing_indexes)
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+import asyncio
+from app import bot, subscriptions
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+def _fake_predictions(monkeypatch):
+    async def model_predict(site):
+        return {'site': site, 'odds': 2.0, 'confidence': 60, 'ts': 0}
+
+    async def batch_predict(sites=None):
+        return [{'site': 'global', 'odds': 1.5, 'confidence': 40, 'ts': 0}]
+
+    monkeypatch.setattr(bot.predictor, 'model_predict', model_predict)
+    monkeypatch.setattr(bot.predictor, 'batch_predict', batch_predict)
+
+
+def test_digest_sends_one_message_per_user(monkeypatch):
+    _fake_predictions(monkeypatch)
+    monkeypatch.setitem(bot.DISPATCH_STATS, 'api_calls_saved', 0)
+    subscriptions.clear_index()
+    subscriptions.index_user(1, 'en', ['1xBet', 'BetPawa', 'SportyBet'])
+    subscriptions.index_user(2, 'fr', ['1xBet', 'BetPawa'], digest=False)
+    subscriptions.index_user(3, 'en', [])
+    fake = FakeBot()
+    asyncio.run(bot.dispatch_signals(fake))
+    subscriptions.clear_index()
+
+    by_chat = {}
+    for chat_id, text in fake.sent:
+        by_chat.setdefault(chat_id, []).append(text)
+    assert len(by_chat[1]) == 1
+    assert 'Signals (3)' in by_chat[1][0]
+    assert all(s in by_chat[1][0] for s in ('1xBet', 'BetPawa', 'SportyBet'))
+    assert len(by_chat[2]) == 2
+    assert len(by_chat[3]) == 1
+    assert bot.DISPATCH_STATS['last_tick_saved'] == 2
+    assert bot.DISPATCH_STATS['api_calls_saved'] == 2
@@ -0,0 +1,64 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from sqlalchemy import insert, text, inspect
+from app.db import Base, Observation, make_engine, add_missing_indexes
+from app.export import export_observations
+
+
+ROWS = [
+    {'site': 'A' if i % 2 else 'B', 'odds': json.dumps([1.5, 2.0 + i]), 'multiplier': None, 'ts': 1000 + i // 3}
+    for i in range(50)
+]
+
+
+def _export(tmp_path, **kwargs):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'e.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Observation.__table__), ROWS)
+        chunks = [c async for c in export_observations(engine=engine, page_size=7, **kwargs)]
+        await engine.dispose()
+        return chunks
+
+    return asyncio.run(run())
+
+
+def test_ndjson_streams_every_row_in_keyset_order(tmp_path):
+    chunks = _export(tmp_path)
+    assert len(chunks) == 8  # one chunk per page
+    rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert [r['id'] for r in rows] == list(range(1, 51))
+    assert [(r['ts'], r['id']) for r in rows] == sorted((r['ts'], r['id']) for r in rows)
+
+
+def test_filters_and_csv(tmp_path):
+    data = b''.join(_export(tmp_path, fmt='csv', sites=['A'], since=1005, until=1010)).decode()
+    rows = list(csv.DictReader(io.StringIO(data)))
+    expected = [r for r in ROWS if r['site'] == 'A' and 1005 <= r['ts'] < 1010]
+    assert len(rows) == len(expected) > 0
+    assert all(r['site'] == 'A' for r in rows)
+
+
+def test_gzip_output_matches_plain(tmp_path):
+    plain = b''.join(_export(tmp_path))
+    (tmp_path / 'e.db').unlink()
+    packed = b''.join(_export(tmp_path, compress=True))
+    assert gzip.decompress(packed) == plain
+
+
+def test_add_missing_indexes_on_existing_table(tmp_path):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'old.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text('CREATE TABLE observations (id INTEGER PRIMARY KEY, site VARCHAR, odds VARCHAR, multiplier VARCHAR, ts INTEGER NOT NULL)'))
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(add_missing_indexes)
+            names = await conn.run_sync(lambda c: {i['name'] for i in inspect(c).get_indexes('observations')})
+        await engine.dispose()
+        return names
+
+    assert {'ix_observations_ts_id', 'ix_observations_site_ts_id'} <= asyncio.run(run())
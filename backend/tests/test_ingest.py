@@ -0,0 +1,50 @@
+import asyncio
+from sqlalchemy import select, func
+from app.db import make_engine, Base, Observation
+from app.ingest import ObservationBuffer
+
+
+async def _engine(tmp_path):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def _count(engine):
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(Observation.__table__))).scalar()
+
+
+def test_flush_on_size_threshold(tmp_path):
+    async def run():
+        engine = await _engine(tmp_path)
+        buf = ObservationBuffer(engine=engine, max_rows=3, max_age=3600)
+        await buf.add('1xBet', '[1.5]')
+        await buf.add('1xBet', '[1.6]')
+        before = await _count(engine)
+        await buf.add('BetPawa', '[2.0]')
+        after = await _count(engine)
+        await engine.dispose()
+        return before, after, buf.snapshot()
+
+    before, after, snap = asyncio.run(run())
+    assert before == 0
+    assert after == 3
+    assert snap['flushes'] == 1
+    assert snap['pending'] == 0
+    assert snap['last_flush_rows'] == 3
+
+
+def test_close_flushes_pending_rows(tmp_path):
+    async def run():
+        engine = await _engine(tmp_path)
+        buf = ObservationBuffer(engine=engine, max_rows=1000, max_age=3600)
+        for i in range(10):
+            await buf.add('SportyBet', '[]', ts=1000 + i)
+        await buf.close()
+        n = await _count(engine)
+        await engine.dispose()
+        return n
+
+    assert asyncio.run(run()) == 10
@@ -0,0 +1,62 @@
+import asyncio
+import gzip
+import json
+import numpy as np
+from sqlalchemy import insert, select
+from app.db import Base, Observation, make_engine
+from app.labels import import_labels, match_nearest
+
+
+def test_match_nearest_picks_closest_within_tolerance():
+    obs = np.array([100, 200, 300])
+    nearest, ok = match_nearest(obs, np.array([90, 160, 240, 500]), tolerance=45)
+    assert nearest.tolist() == [0, 1, 1, 2]
+    assert ok.tolist() == [True, True, True, False]
+
+
+def _run(tmp_path, path, **kwargs):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'l.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Observation.__table__), [
+                {'site': 'A', 'odds': '[1.5]', 'multiplier': None, 'ts': 1000 + 60 * i} for i in range(10)
+            ] + [{'site': 'B', 'odds': '[2.0]', 'multiplier': None, 'ts': 1000}])
+        stats = await import_labels(str(path), engine=engine, chunk_size=3, **kwargs)
+        async with engine.connect() as conn:
+            rows = (await conn.execute(select(Observation.site, Observation.ts, Observation.multiplier)
+                                       .order_by(Observation.id))).all()
+        await engine.dispose()
+        return stats, rows
+
+    return asyncio.run(run())
+
+
+def test_csv_labels_update_nearest_observation(tmp_path):
+    path = tmp_path / 'labels.csv'
+    path.write_text('site,ts,multiplier\nA,1005,2.5\nA,1118,3.0\nA,1125,9.0\nB,1010,1.2\nA,5000,4.0\nA,x,1\n')
+    stats, rows = _run(tmp_path, path)
+    labels = {(s, ts): m for s, ts, m in rows if m is not None}
+    assert labels == {('A', 1000): '2.5', ('A', 1120): '3.0', ('B', 1000): '1.2'}
+    assert stats['records'] == 5 and stats['invalid'] == 1
+    assert stats['duplicates'] == 1 and stats['unmatched'] == 1
+    assert stats['rows_per_sec'] > 0
+
+
+def test_gzipped_ndjson_with_insert_unmatched(tmp_path):
+    path = tmp_path / 'labels.ndjson.gz'
+    with gzip.open(path, 'wt') as f:
+        for rec in [{'site': 'A', 'ts': 1061, 'multiplier': 1.9}, {'site': 'C', 'ts': 42, 'multiplier': 7.0}]:
+            f.write(json.dumps(rec) + '\n')
+    stats, rows = _run(tmp_path, path, insert_unmatched=True)
+    assert stats['matched'] == 1 and stats['inserted'] == 1
+    assert ('C', 42, '7.0') in rows
+    assert ('A', 1060, '1.9') in rows
+
+
+def test_label_sites_are_canonicalized(tmp_path):
+    from app.labels import iter_label_chunks
+    path = tmp_path / 'labels.csv'
+    path.write_text('site,ts,multiplier\n1xbet,1000,2.5\nwilliamhill.com,1000,1.8\nA,1000,3.0\n')
+    labels = [l for chunk in iter_label_chunks(str(path)) for l in chunk]
+    assert [l[0] for l in labels] == ['1xBet', 'William Hill', 'A']
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from app.db import Base, make_engine
+from app.leader import LeaderElector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _engine(url):
+    engine = make_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def test_heartbeat_expiry_and_takeover(tmp_path):
+    clock = FakeClock()
+    events = []
+
+    async def run():
+        engine = await _engine(f"sqlite+aiosqlite:///{tmp_path/'lease.db'}")
+
+        async def demoted():
+            events.append('a demoted')
+
+        a = LeaderElector(holder='a', ttl=30, renew_interval=10, engine=engine, clock=clock, on_demoted=demoted)
+        b = LeaderElector(holder='b', ttl=30, renew_interval=10, engine=engine, clock=clock)
+        assert await a.tick() is True
+        assert await b.tick() is False
+        clock.now += 20
+        assert await a.tick() is True  # heartbeat extends the lease
+        clock.now += 20
+        assert await b.tick() is False
+        # a stops heartbeating; b takes over once the lease has expired
+        clock.now += 31
+        assert await b.tick() is True
+        assert b.term == 2
+        assert await a.tick() is False
+        await engine.dispose()
+        return a, b
+
+    a, b = asyncio.run(run())
+    assert events == ['a demoted']
+    assert a.stats['demotions'] == 1 and b.is_leader
+
+
+def test_release_lets_follower_take_over_immediately(tmp_path):
+    clock = FakeClock()
+
+    async def run():
+        engine = await _engine(f"sqlite+aiosqlite:///{tmp_path/'lease.db'}")
+        a = LeaderElector(holder='a', ttl=30, engine=engine, clock=clock)
+        b = LeaderElector(holder='b', ttl=30, engine=engine, clock=clock)
+        await a.tick()
+        await a.stop()
+        won = await b.tick()
+        await engine.dispose()
+        return a, won
+
+    a, won = asyncio.run(run())
+    assert won and not a.is_leader
+
+
+def test_failed_elected_hook_gives_up_the_lease(tmp_path):
+    clock = FakeClock()
+
+    async def run():
+        engine = await _engine(f"sqlite+aiosqlite:///{tmp_path/'lease.db'}")
+
+        async def broken():
+            raise RuntimeError('migration failed')
+
+        a = LeaderElector(holder='a', ttl=30, engine=engine, clock=clock, on_elected=broken)
+        b = LeaderElector(holder='b', ttl=30, engine=engine, clock=clock)
+        await a.tick()
+        await asyncio.sleep(0.05)  # the hook runs off the heartbeat task
+        won = await b.tick()
+        await b.stop()
+        await engine.dispose()
+        return a, won
+
+    a, won = asyncio.run(run())
+    assert not a.is_leader and a.stats['hook_errors'] == 1
+    assert won
+
+
+def test_leader_steps_down_before_unrenewed_lease_expires(tmp_path):
+    demoted = []
+
+    async def run():
+        engine = await _engine(f"sqlite+aiosqlite:///{tmp_path/'lease.db'}")
+
+        async def on_demoted():
+            demoted.append(time.time())
+
+        a = LeaderElector(holder='a', ttl=0.3, renew_interval=10, engine=engine, on_demoted=on_demoted)
+        await a.tick()
+        expires = a.lease_expires
+        await engine.dispose()  # no further heartbeats
+        await asyncio.sleep(0.4)
+        return a, expires
+
+    a, expires = asyncio.run(run())
+    assert not a.is_leader and a.stats['expired'] == 1
+    assert demoted and demoted[0] < expires
+
+
+def _worker(url, holder, duration, crash, out_path):
+    """Run an elector in its own process and record its leadership tenures."""
+    tenures = []
+
+    async def elected():
+        tenures.append([time.time(), None, elector.term])
+
+    async def demoted():
+        tenures[-1][1] = time.time()
+
+    elector = LeaderElector(holder=holder, ttl=0.6, renew_interval=0.1, engine=make_engine(url),
+                            on_elected=elected, on_demoted=demoted)
+
+    async def run():
+        elector.start()
+        await asyncio.sleep(duration)
+        if crash:
+            # simulate a dead process: no demotion, no release, the lease just stops being renewed
+            elector._task.cancel()
+            if elector._expiry_task:
+                elector._expiry_task.cancel()
+            if tenures and tenures[-1][1] is None:
+                tenures[-1][1] = time.time()
+        else:
+            await elector.stop()
+        # close the aiosqlite worker threads, or the process cannot exit
+        await elector._engine.dispose()
+
+    asyncio.run(run())
+    with open(out_path, 'w') as f:
+        json.dump(tenures, f)
+
+
+def test_single_leader_across_processes(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path/'lease.db'}"
+
+    async def setup():
+        engine = await _engine(url)
+        await engine.dispose()
+
+    asyncio.run(setup())
+    ctx = multiprocessing.get_context('spawn')
+    procs = []
+    # worker 0 starts first so it is elected, then dies without releasing
+    specs = [('w0', 1.0, True), ('w1', 2.5, False), ('w2', 2.5, False)]
+    for holder, duration, crash in specs:
+        p = ctx.Process(target=_worker, args=(url, holder, duration, crash, str(tmp_path / f'{holder}.json')))
+        p.start()
+        procs.append(p)
+        if holder == 'w0':
+            time.sleep(0.5)
+    for p in procs:
+        p.join(30)
+        assert p.exitcode == 0
+
+    tenures = []
+    for holder, _, _ in specs:
+        with open(tmp_path / f'{holder}.json') as f:
+            tenures.extend((start, end, term, holder) for start, end, term in json.load(f))
+    tenures.sort()
+    assert tenures[0][3] == 'w0'
+    assert len({t[3] for t in tenures}) >= 2  # someone took over after the crash
+    for prev, nxt in zip(tenures, tenures[1:]):
+        assert prev[1] <= nxt[0]  # never two leaders at once
+        assert nxt[2] > prev[2]  # every takeover bumps the term
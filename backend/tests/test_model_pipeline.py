@@ -11,3 +11,11 @@ async def test_load_dataset_empty():
 def test_train_not_enough():
     res = model.train_and_save([[1,0,1,1,1]]*5, [2.0]*5)
     assert res['ok'] is False
+
+
+def test_load_dataset_limit_covers_archive(monkeypatch):
+    from app import retention
+    rows = ({'ts': i, 'odds': '[1.5, 2.0]', 'multiplier': '2.5'} for i in range(100))
+    monkeypatch.setattr(retention, 'iter_archived_observations', lambda: rows)
+    X, y = asyncio.run(model.load_dataset(limit=10, include_archive=True))
+    assert len(X) == len(y) == 10
@@ -0,0 +1,54 @@
+import json
+import os
+import random
+import numpy as np
+from app import model
+
+
+def _dataset(n, level, start=0):
+    rnd = random.Random(level)
+    d = {'ts': [], 'X': [], 'y': []}
+    for i in range(n):
+        odds = [level + rnd.random() for _ in range(3)]
+        d['ts'].append(start + i)
+        d['X'].append([float(np.mean(odds)), float(np.std(odds)), min(odds), max(odds), 3])
+        d['y'].append(level + rnd.random())
+    return d
+
+
+def test_time_split_holds_out_the_newest_rows():
+    X = np.arange(10).reshape(-1, 1)
+    y = np.arange(10)
+    X_train, X_test, y_train, y_test = model.time_split(X, y)
+    assert y_train.max() < y_test.min()
+    assert len(y_test) == 2
+
+
+def test_train_per_site_writes_manifest_and_loads_lazily(tmp_path):
+    datasets = {'A': _dataset(60, 1.0), 'B': _dataset(60, 5.0, start=1000), 'C': _dataset(5, 9.0)}
+    res = model.train_per_site(datasets, n_estimators=10, max_workers=2, models_dir=str(tmp_path))
+    assert res['skipped'] == ['C']
+    for key in ('A', 'B', model.GLOBAL_KEY):
+        r = res['results'][key]
+        assert r['ok'] and r['peak_mb'] > 0 and r['seconds'] > 0
+    assert res['results'][model.GLOBAL_KEY]['n_train'] == 100
+    with open(tmp_path / 'manifest.json') as f:
+        manifest = json.load(f)
+    assert set(manifest['sites']) == {'A', 'B'}
+    assert os.path.exists(tmp_path / manifest['sites']['A']['path'])
+
+    a = model.load_site_model('A', models_dir=str(tmp_path))
+    b = model.load_site_model('B', models_dir=str(tmp_path))
+    assert model.predict_from_model(a, [1.2, 1.5]) < 3 < model.predict_from_model(b, [5.2, 5.5])
+    # unknown or skipped sites use the global model, loaded once and cached
+    fallback = model.load_site_model('C', models_dir=str(tmp_path))
+    assert fallback is model.load_site_model(None, models_dir=str(tmp_path))
+    assert fallback is not a
+
+
+def test_train_per_site_not_ok_when_every_fit_fails(tmp_path):
+    # ragged feature rows make every fit raise inside the worker
+    bad = {'ts': list(range(30)), 'X': [[1.0]] * 15 + [[1.0, 2.0]] * 15, 'y': [2.0] * 30}
+    res = model.train_per_site({'A': bad}, n_estimators=5, max_workers=1, models_dir=str(tmp_path))
+    assert res['results'] and not any(r['ok'] for r in res['results'].values())
+    assert res['ok'] is False
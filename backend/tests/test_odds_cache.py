@@ -0,0 +1,95 @@
+import asyncio
+from app.odds_cache import OddsSnapshotStore
+
+
+def _fetcher(calls, result=None, delay=0.05):
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(delay)
+        return result or {'site': key, 'odds': [1.5, 2.0]}
+    return fetch
+
+
+def test_fresh_snapshot_served_without_fetch():
+    calls = []
+    store = OddsSnapshotStore(max_age=60, path='', fetcher=_fetcher(calls))
+    store.put('1xBet', {'site': '1xBet', 'odds': [3.0]})
+    data = asyncio.run(store.get_or_refresh('1xBet'))
+    assert data['odds'] == [3.0]
+    assert calls == []
+    assert store.stats['hits'] == 1
+
+
+def test_concurrent_refreshes_are_coalesced():
+    calls = []
+    store = OddsSnapshotStore(max_age=60, path='', fetcher=_fetcher(calls))
+
+    async def run():
+        return await asyncio.gather(*[store.get_or_refresh('BetPawa') for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == ['BetPawa']
+    assert all(r['odds'] == [1.5, 2.0] for r in results)
+    assert store.snapshot()['coalesced'] == 4
+
+
+def test_failed_refresh_falls_back_to_stale_snapshot():
+    calls = []
+    store = OddsSnapshotStore(max_age=0, path='', fetcher=_fetcher(calls, {'odds': [], 'error': 'failed_fetch'}, delay=0))
+    store.put('SportyBet', {'odds': [2.2]}, ts=1)
+    data = asyncio.run(store.get_or_refresh('SportyBet'))
+    assert data['odds'] == [2.2]
+    assert store.stats['stale_served'] == 1
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / 'snap.json')
+    store = OddsSnapshotStore(path=path)
+    store.put('Bet365', {'odds': [1.1]})
+    store.save()
+    other = OddsSnapshotStore(path=path)
+    other.load()
+    assert other.get('Bet365')['odds'] == [1.1]
+
+
+def test_shared_snapshot_served_by_other_worker(tmp_path):
+    from app.db import Base, make_engine
+    calls = []
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'odds.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        leader = OddsSnapshotStore(max_age=60, path='', shared=True, engine=engine)
+        follower = OddsSnapshotStore(max_age=60, path='', fetcher=_fetcher(calls), shared=True, engine=engine)
+        leader.put('1xBet', {'site': '1xBet', 'odds': [2.5]})
+        await leader.publish('1xBet')
+        data = await follower.get_or_refresh('1xBet')
+        await engine.dispose()
+        return data, follower
+
+    data, follower = asyncio.run(run())
+    assert data['odds'] == [2.5]
+    assert calls == []
+    assert follower.stats['shared_hits'] == 1
+
+
+def test_store_evicts_oldest_beyond_max_keys():
+    store = OddsSnapshotStore(path='', max_keys=2)
+    for key in ('1xBet', 'BetPawa', 'SportyBet'):
+        store.put(key, {'odds': [1.5]})
+    assert store.get('1xBet') is None
+    assert store.get('BetPawa') and store.get('SportyBet')
+
+
+def test_model_predict_never_fetches_unknown_sites(monkeypatch):
+    from app import predictor
+    calls = []
+    store = OddsSnapshotStore(max_age=60, path='', fetcher=_fetcher(calls, delay=0))
+    monkeypatch.setattr(predictor, 'odds_snapshots', store)
+    for text in ('http://169.254.169.254/latest/meta-data', 'internal.host:8080', 'no such site'):
+        asyncio.run(predictor.model_predict(text))
+    assert calls == [] and store.snapshot()['sites'] == 0
+    asyncio.run(predictor.model_predict('https://www.1xbet.com/en/allgamesentrance/aviator'))
+    asyncio.run(predictor.model_predict('1XBET'))
+    assert calls == ['1xBet']
@@ -0,0 +1,63 @@
+import asyncio
+from app import scrapers
+from app.scrapers import PARSERS, SITE_PATTERNS, identify_site_from_url, extract_odds_from_html
+
+
+def test_every_site_has_a_parser():
+    assert set(SITE_PATTERNS) <= set(PARSERS)
+
+
+def test_identify_site_from_host():
+    assert identify_site_from_url('https://www.1xbet.com/en/live') == '1xBet'
+    assert identify_site_from_url('https://m.betclic.com/') == 'Betclic'
+    assert identify_site_from_url('https://sports.betway.com/en') == 'BetWay'
+    assert identify_site_from_url('betpawa.com') == 'BetPawa'
+    # a link to another site in the path no longer misroutes
+    assert identify_site_from_url('https://example.org/?ref=1xbet.com') is None
+
+
+def test_site_hint_beats_content_sniffing(monkeypatch):
+    calls = []
+    monkeypatch.setitem(PARSERS, 'BetPawa', lambda html: calls.append('betpawa') or [2.0])
+    monkeypatch.setitem(PARSERS, '1xBet', lambda html: calls.append('1xbet') or [9.0])
+    html = '<a href="https://1xbet.com">partner</a><div data-price="2.00">2.00</div>'
+    res = asyncio.run(extract_odds_from_html(html, site='BetPawa'))
+    assert res['odds'] == [2.0]
+    assert calls == ['betpawa']
+
+
+def test_declarative_selector_parser():
+    html = '<span data-odds="3.10"></span><div class="market-price">1.85</div>'
+    odds = PARSERS['Bet365'](html)
+    assert 3.1 in odds
+    assert 1.85 in odds
+
+
+def test_register_parser_adds_hosts():
+    @scrapers.register_parser('ExampleBet', hosts=['examplebet.test'])
+    def _parse(html):
+        return [4.2]
+
+    try:
+        assert identify_site_from_url('https://www.examplebet.test/crash') == 'ExampleBet'
+        assert asyncio.run(extract_odds_from_html('<p></p>', site='ExampleBet'))['odds'] == [4.2]
+    finally:
+        PARSERS.pop('ExampleBet', None)
+        scrapers.HOST_INDEX.pop('examplebet.test', None)
+
+
+def test_registered_parser_skips_full_page_text(monkeypatch):
+    parsed = []
+    real = scrapers.BeautifulSoup
+
+    def spy(markup, *args, **kwargs):
+        parsed.append(len(markup))
+        return real(markup, *args, **kwargs)
+
+    monkeypatch.setattr(scrapers, 'BeautifulSoup', spy)
+    monkeypatch.setitem(PARSERS, 'BetPawa', lambda html: [2.0])
+    html = '<html><body><p>Aviator</p>' + '<div>x</div>' * 100000 + '</body></html>'
+    res = asyncio.run(extract_odds_from_html(html, site='BetPawa'))
+    assert res['odds'] == [2.0]
+    assert res['raw_text_sample'].startswith('Aviator')
+    assert parsed and max(parsed) <= scrapers.RAW_SAMPLE_PREFIX
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import pstats
+import pytest
+from app.profiling import Profiler
+from app import supervisor as supervisor_mod
+from app.supervisor import Supervisor
+
+
+def _busy():
+    return sum(i * i for i in range(20000))
+
+
+def test_timed_profile_writes_prof_file(tmp_path):
+    prof = Profiler(out_dir=str(tmp_path))
+
+    async def run():
+        async def spin():
+            for _ in range(5):
+                _busy()
+                await asyncio.sleep(0.01)
+        task = asyncio.create_task(spin())
+        report = await prof.profile_for(0.2)
+        await task
+        return report
+
+    report = asyncio.run(run())
+    assert os.path.exists(report['path'])
+    assert '_busy' in report['stats']
+    pstats.Stats(report['path'])  # loadable by standard tools
+    assert prof.active is None
+
+
+def test_only_one_profile_at_a_time(tmp_path):
+    prof = Profiler(out_dir=str(tmp_path))
+
+    async def run():
+        first = asyncio.create_task(prof.profile_for(0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(RuntimeError):
+            await prof.profile_for(0.1)
+        await first
+
+    asyncio.run(run())
+
+
+def test_armed_job_runs_are_profiled_then_disarmed(tmp_path, monkeypatch):
+    prof = Profiler(out_dir=str(tmp_path))
+    monkeypatch.setattr(supervisor_mod, 'profiler', prof)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        _busy()
+
+    async def run():
+        sup = Supervisor()
+        sup.add_job('collect', work, interval=0.05)
+        prof.arm('collect', 2)
+        sup.start()
+        await asyncio.sleep(0.3)
+        await sup.stop()
+
+    asyncio.run(run())
+    assert len(calls) >= 4
+    assert [r['label'] for r in prof.reports] == ['job-collect', 'job-collect']
+    assert prof.armed == {}
+    assert 'overhead_ratio' in prof.reports[1]
@@ -0,0 +1,44 @@
+import asyncio
+import json
+from sqlalchemy import select
+from app.db import make_engine, Base, Observation, ObservationSummary
+from app import retention
+
+DAY = 86400
+
+
+def test_retention_archives_summarizes_and_deletes(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention.settings, 'RETENTION_RAW_DAYS', 30)
+    monkeypatch.setattr(retention.settings, 'RETENTION_BATCH_SIZE', 2)
+    monkeypatch.setattr(retention.settings, 'RETENTION_BATCH_PAUSE', 0)
+    now = 100 * DAY
+    old_ts = now - 40 * DAY
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'ret.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(Observation.__table__.insert(), [
+                {'site': '1xBet', 'odds': json.dumps([1.5, 2.5]), 'multiplier': '2.0', 'ts': old_ts},
+                {'site': '1xBet', 'odds': json.dumps([3.0]), 'multiplier': None, 'ts': old_ts + 10},
+                {'site': 'BetPawa', 'odds': json.dumps([]), 'multiplier': None, 'ts': old_ts + 20},
+                {'site': '1xBet', 'odds': json.dumps([1.2]), 'multiplier': None, 'ts': now - DAY},
+            ])
+        stats = await retention.run_retention(now=now, engine=engine, archive_dir=str(tmp_path / 'archive'))
+        async with engine.connect() as conn:
+            remaining = (await conn.execute(select(Observation.__table__.c.ts))).scalars().all()
+            summaries = (await conn.execute(select(ObservationSummary.__table__))).mappings().all()
+        await engine.dispose()
+        return stats, remaining, summaries
+
+    stats, remaining, summaries = asyncio.run(run())
+    assert remaining == [now - DAY]
+    assert stats['rows_deleted'] == 3
+    assert stats['batches'] == 2
+    by_site = {s['site']: s for s in summaries}
+    assert by_site['1xBet']['n_obs'] == 2
+    assert by_site['1xBet']['n_odds'] == 3
+    assert by_site['1xBet']['odds_max'] == 3.0
+    assert by_site['1xBet']['n_labeled'] == 1
+    archived = list(retention.iter_archived_observations(archive_dir=str(tmp_path / 'archive')))
+    assert sorted(r['ts'] for r in archived) == [old_ts, old_ts + 10, old_ts + 20]
@@ -0,0 +1,163 @@
+from app.scheduler import AdaptiveScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler(clock):
+    return AdaptiveScheduler(['A', 'B'], base_interval=300, min_interval=60, max_interval=1800, jitter=0, clock=clock)
+
+
+def test_all_sites_due_at_start():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    assert sorted(sched.due_sites()) == ['A', 'B']
+    assert sched.due_sites() == []
+
+
+def test_changing_site_polled_faster_than_static_site():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.due_sites()
+    for i in range(3):
+        fast = sched.record('A', odds_hash=f'h{i}')
+        slow = sched.record('B', odds_hash='same')
+    assert fast == 60
+    assert slow > 300
+    assert sched.seconds_until_next() == 60
+
+
+def test_failures_back_off_and_respect_max():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.due_sites()
+    delays = [sched.record('A', ok=False) for _ in range(6)]
+    assert delays[0] < delays[1] < delays[2]
+    assert max(delays) == 1800
+
+
+def test_expensive_fetch_is_spaced_out():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.due_sites()
+    sched.record('A', odds_hash='x')
+    assert sched.record('A', odds_hash='y', cost=10.0) == 200
+
+
+def test_snapshot_orders_by_next_due():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.due_sites()
+    sched.record('A', odds_hash='x')
+    sched.record('B', ok=False)
+    snap = sched.snapshot()
+    assert [r['site'] for r in snap] == ['A', 'B']
+    assert snap[1]['failures'] == 1
+
+
+def test_due_sites_collected_concurrently_with_cap(monkeypatch):
+    import asyncio
+    from app import tasks
+    active, peak, done = [0], [0], []
+
+    async def fake_collect(site, scheduler):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        done.append(site)
+
+    monkeypatch.setattr(tasks, '_collect_and_reschedule', fake_collect)
+    scheduler = AdaptiveScheduler(jitter=0)
+    n = asyncio.run(tasks.collect_due_sites(scheduler, concurrency=3))
+    assert n == len(done) > 3
+    assert peak[0] == 3
+
+
+def test_collect_error_is_recorded_as_failure(monkeypatch):
+    import asyncio
+    import pytest
+    from app import tasks
+
+    async def boom(sites):
+        raise RuntimeError('db down')
+
+    monkeypatch.setattr(tasks, 'collect_observations_for_sites', boom)
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    assert 'A' in scheduler.due_sites()
+    with pytest.raises(RuntimeError):
+        asyncio.run(tasks._collect_and_reschedule('A', scheduler))
+    row = next(r for r in scheduler.snapshot() if r['site'] == 'A')
+    assert row['failures'] == 1 and row['next_due'] > clock.now
+
+
+def test_cancelled_collect_run_keeps_sites_scheduled(monkeypatch):
+    import asyncio
+    from app import tasks
+    started = []
+
+    async def slow(site, scheduler):
+        started.append(site)
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(tasks, '_collect_and_reschedule', slow)
+    monkeypatch.setattr('app.bot.SUPPORTED_SITES', ['A', 'B'])
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+
+    async def run():
+        task = asyncio.create_task(tasks.collect_due_sites(scheduler, concurrency=1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert started == ['A'] or started == ['B']
+    assert sorted(scheduler.due_sites(now=1e12)) == ['A', 'B']
+
+
+def test_collect_keeps_db_work_out_of_the_fetch_loop(tmp_path, monkeypatch):
+    import asyncio
+    import time
+    from sqlalchemy import select
+    from app import tasks
+    from app.db import Base, SiteBlacklist, SharedOddsSnapshot, make_engine
+    from app.odds_cache import OddsSnapshotStore
+    from app.scraper_state import record_outcomes
+    open_during_fetch = []
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'collect.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await record_outcomes(conn, failed=['Bet365'] * 3, now=int(time.time()))
+
+        async def fake_odds(site):
+            open_during_fetch.append(engine.pool.checkedout())
+            return {'site': site, 'odds': [1.5]} if site == '1xBet' else {'odds': [], 'error': 'failed_fetch'}
+
+        class Buffer:
+            async def add(self, *args, **kwargs):
+                pass
+
+        monkeypatch.setattr(tasks, 'get_latest_odds', fake_odds)
+        monkeypatch.setattr(tasks, 'observation_buffer', Buffer())
+        monkeypatch.setattr(tasks, 'odds_snapshots', OddsSnapshotStore(path='', shared=True, engine=engine))
+        res = await tasks.collect_observations_for_sites(['1xBet', 'BetPawa', 'Bet365'], engine=engine)
+        async with engine.connect() as conn:
+            fails = dict((await conn.execute(select(SiteBlacklist.site, SiteBlacklist.fail_count))).all())
+            shared = (await conn.execute(select(SharedOddsSnapshot.key))).scalars().all()
+        await engine.dispose()
+        return res, fails, shared
+
+    res, fails, shared = asyncio.run(run())
+    assert open_during_fetch == [0, 0]
+    assert [r.get('skipped', False) for r in res] == [False, False, True]
+    assert fails['BetPawa'] == 1 and fails['Bet365'] == 3
+    assert shared == ['1xBet']
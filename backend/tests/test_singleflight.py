@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from app.singleflight import SingleFlight
+from app import scrapers
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        return await asyncio.gather(*[flight.do('k', work) for _ in range(10)])
+
+    assert asyncio.run(run()) == [42] * 10
+    assert len(calls) == 1
+    assert flight.stats['suppressed'] == 9
+    assert flight.inflight() == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError('nope')
+
+    async def run():
+        return await asyncio.gather(*[flight.do('k', boom) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 'ok'
+
+    async def run():
+        first = asyncio.ensure_future(flight.do('k', work))
+        second = asyncio.ensure_future(flight.do('k', work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 'ok'
+
+
+def test_get_site_odds_by_url_coalesces_on_normalized_url(monkeypatch):
+    calls = []
+
+    async def fake_fetch(url, **kwargs):
+        calls.append(url)
+        await asyncio.sleep(0.02)
+        return '<div class="odds">1.75</div>'
+
+    monkeypatch.setattr(scrapers, 'fetch_html', fake_fetch)
+
+    async def run():
+        return await asyncio.gather(
+            scrapers.get_site_odds_by_url('https://www.BetPawa.com/'),
+            scrapers.get_site_odds_by_url('https://www.betpawa.com#top'),
+            scrapers.get_site_odds_by_url('https://www.betpawa.com:443'),
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(1.75 in r['odds'] for r in results)
+    assert scrapers.normalize_url('HTTP://Example.com:80/a/?q=1#x') == 'http://example.com/a?q=1'
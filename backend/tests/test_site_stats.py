@@ -0,0 +1,86 @@
+import asyncio
+import json
+import random
+import numpy as np
+import pytest
+from sqlalchemy import insert
+from app.db import Base, Observation, make_engine
+from app.site_stats import RollingWindow, SiteStats
+from app.predictor import _heuristic_from_odds
+
+
+def test_window_matches_numpy_over_last_values():
+    rnd = random.Random(3)
+    values = [1 + rnd.expovariate(0.5) for _ in range(1000)]
+    w = RollingWindow(128)
+    for v in values:
+        w.add(v)
+    tail = np.array(values[-128:])
+    assert w.n == 128
+    assert w.mean == pytest.approx(tail.mean())
+    assert w.std == pytest.approx(tail.std())
+    # the sketch is exact to within one log bin (~11%)
+    for q in (0.1, 0.5, 0.9):
+        assert w.quantile(q) == pytest.approx(np.quantile(tail, q), rel=0.12)
+
+
+def test_record_skips_empty_odds():
+    stats = SiteStats(size=4)
+    stats.record('A', [])
+    assert stats.context('A') is None
+    stats.record('A', [1.5, 2.5])
+    assert stats.context('A')['mean'] == 2.0
+
+
+def test_rebuild_keeps_newest_rows_per_site(tmp_path):
+    rows = [{'site': 'A', 'odds': json.dumps([float(i)]), 'multiplier': None, 'ts': 1000 + i} for i in range(1, 21)]
+    rows.append({'site': 'B', 'odds': '[]', 'multiplier': None, 'ts': 5})
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path/'s.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Observation.__table__), rows)
+        stats = SiteStats(size=5)
+        loaded = await stats.rebuild(engine)
+        await engine.dispose()
+        return stats, loaded
+
+    stats, loaded = asyncio.run(run())
+    assert loaded == 5
+    ctx = stats.context('A')
+    assert ctx['mean'] == 18.0  # 16..20
+    assert ctx['last_ts'] == 1020
+    assert stats.context('B') is None
+
+
+def test_history_adjusts_heuristic():
+    history = {'n': 100, 'mean': 2.0, 'std': 0.2, 'p50': 1.9}
+    base = _heuristic_from_odds([2.0, 2.1])
+    assert _heuristic_from_odds([2.0, 2.1], history)['confidence'] == base['confidence'] + 5
+    assert _heuristic_from_odds([4.0, 4.1], history)['confidence'] < base['confidence']
+    assert _heuristic_from_odds([], history) == {'odds': 1.9, 'confidence': 40}
+
+
+def test_windows_rebuilt_on_election_and_on_followers(monkeypatch):
+    from types import SimpleNamespace
+    from app import bot
+    rebuilds = []
+
+    async def rebuild():
+        rebuilds.append(1)
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(bot.site_stats, 'rebuild', rebuild)
+    monkeypatch.setattr(bot.subscriptions, 'migrate_preferred_sites', noop)
+    monkeypatch.setattr(bot.subscriptions, 'rebuild_index', noop)
+    app = SimpleNamespace(supervisor=SimpleNamespace(start=lambda: None), leader=SimpleNamespace(is_leader=False))
+    asyncio.run(bot.refresh_follower_stats(app))
+    assert len(rebuilds) == 1
+    app.leader.is_leader = True
+    asyncio.run(bot.refresh_follower_stats(app))
+    assert len(rebuilds) == 1
+    asyncio.run(bot.start_background_jobs(app))
+    assert len(rebuilds) == 2
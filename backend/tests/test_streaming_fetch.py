@@ -0,0 +1,73 @@
+import asyncio
+import httpx
+from app import scrapers
+from app.proxy_pool import ProxyPool
+
+
+def _transport(body: bytes, chunk: int = 100):
+    class ChunkedStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for i in range(0, len(body), chunk):
+                yield body[i:i + chunk]
+
+    def handler(request):
+        return httpx.Response(200, headers={'content-type': 'text/html; charset=utf-8'}, stream=ChunkedStream())
+
+    return httpx.MockTransport(handler)
+
+
+def test_body_is_truncated_at_max_bytes(monkeypatch):
+    monkeypatch.setattr(scrapers.settings, 'FETCH_CHUNK_SIZE', 100)
+    body = b'<div class="odds">1.50</div>' + b'x' * 5000
+    html = asyncio.run(scrapers.fetch_html('https://trunc.example/', retries=0, max_bytes=1000, pool=ProxyPool([]), transport=_transport(body)))
+    assert len(html) == 1000
+    assert html.startswith('<div class="odds">1.50</div>')
+    assert scrapers.FETCH_STATS['trunc.example']['truncated'] == 1
+
+
+def test_early_exit_hook_stops_reading(monkeypatch):
+    monkeypatch.setattr(scrapers.settings, 'FETCH_CHUNK_SIZE', 100)
+    body = b'<script>window.__DATA__ = {"odds": ["1.45", "2.50"]};</script>' + b'<p>filler</p>' * 1000
+    hook = lambda: scrapers.StopAfterBlock('window.__DATA__')
+    html = asyncio.run(scrapers.fetch_html('https://early.example/', retries=0, pool=ProxyPool([]), stop_hook=hook, transport=_transport(body, chunk=16)))
+    assert '</script>' in html
+    assert len(html) < 200
+    assert scrapers.FETCH_STATS['early.example']['aborted'] == 1
+
+
+def test_multibyte_characters_split_across_chunks():
+    body = ('cote é ' * 50).encode('utf-8')
+    html = asyncio.run(scrapers.fetch_html('https://utf.example/', retries=0, pool=ProxyPool([]), max_bytes=0, transport=_transport(body, chunk=7)))
+    assert html == 'cote é ' * 50
+
+
+def test_stop_hook_finds_markers_split_across_pieces():
+    text = '<p>x</p><script>window.__DATA__ = {"odds": ["1.45"]};</script><p>more</p>'
+    for size in (1, 3, 7):
+        hook = scrapers.StopAfterBlock('window.__DATA__')
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        stop = next(i for i, p in enumerate(pieces) if hook(p))
+        read = ''.join(pieces[:stop + 1])
+        assert '</script>' in read and '</script>' not in ''.join(pieces[:stop])
+    hook = scrapers.StopAfterBlock('window.__DATA__')
+    assert not hook('</script> window.__DA') and not hook('TA__ = 1;')
+
+
+def test_each_attempt_gets_a_fresh_stop_hook(monkeypatch):
+    made, calls = [], []
+
+    def factory():
+        made.append(scrapers.StopAfterBlock('window.__DATA__'))
+        return made[-1]
+
+    async def fake_get(url, timeout, proxy, stop_when=None, **kwargs):
+        calls.append(stop_when)
+        stop_when('<script>window.__DATA__ = {')
+        if len(calls) == 1:
+            raise httpx.ReadTimeout('slow')
+        return '<html>ok</html>'
+
+    monkeypatch.setattr(scrapers, '_get_text', fake_get)
+    html = asyncio.run(scrapers.fetch_html('https://1xbet.com', retries=1, backoff_base=0, pool=ProxyPool([]), stop_hook=factory))
+    assert html == '<html>ok</html>'
+    assert calls == made and made[0] is not made[1]
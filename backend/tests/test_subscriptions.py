@@ -0,0 +1,50 @@
+import asyncio
+from app.db import make_engine, Base, User
+from app import subscriptions
+
+
+def test_parse_sites_canonicalizes_both_formats():
+    assert subscriptions.parse_sites('1xbet, betpawa') == ['1xBet', 'BetPawa']
+    assert subscriptions.parse_sites('1xbet William Hill sportybet') == ['1xBet', 'William Hill', 'SportyBet']
+    assert subscriptions.parse_sites('https://example.org/crash') == ['https://example.org/crash']
+    assert subscriptions.parse_sites('') == []
+
+
+def test_index_user_and_unindex():
+    subscriptions.clear_index()
+    subscriptions.index_user(1, 'fr', ['1xBet', 'BetPawa'])
+    subscriptions.index_user(2, 'en', [])
+    assert subscriptions.SITE_RECIPIENTS == {'1xBet': {1}, 'BetPawa': {1}}
+    assert subscriptions.GLOBAL_RECIPIENTS == {2}
+    subscriptions.index_user(1, 'fr', ['BetPawa'])
+    assert subscriptions.SITE_RECIPIENTS == {'BetPawa': {1}}
+    subscriptions.unindex_user(1)
+    assert subscriptions.SITE_RECIPIENTS == {}
+    assert subscriptions.CHAT_LANG == {2: 'en'}
+    subscriptions.clear_index()
+
+
+def test_migrate_and_rebuild_from_legacy_column(tmp_path):
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'subs.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(User.__table__.insert(), [
+                {'telegram_id': 10, 'subscribed': True, 'language': 'fr', 'preferred_sites': '1xbet BetPawa'},
+                {'telegram_id': 11, 'subscribed': True, 'language': 'en', 'preferred_sites': None},
+                {'telegram_id': 12, 'subscribed': False, 'language': 'en', 'preferred_sites': 'SportyBet'},
+                {'telegram_id': 13, 'subscribed': True, 'language': 'en', 'preferred_sites': 'William Hill, 1xBet'},
+            ])
+        migrated = await subscriptions.migrate_preferred_sites(engine, page_size=2)
+        again = await subscriptions.migrate_preferred_sites(engine, page_size=2)
+        count = await subscriptions.rebuild_index(engine, page_size=2)
+        await engine.dispose()
+        return migrated, again, count
+
+    migrated, again, count = asyncio.run(run())
+    assert migrated == 3
+    assert again == 0
+    assert count == 3
+    assert subscriptions.SITE_RECIPIENTS == {'1xBet': {10, 13}, 'BetPawa': {10}, 'William Hill': {13}}
+    assert subscriptions.GLOBAL_RECIPIENTS == {11}
+    subscriptions.clear_index()
@@ -0,0 +1,97 @@
+import asyncio
+from app.supervisor import Supervisor
+
+
+def test_fixed_rate_does_not_drift_with_work_duration():
+    starts = []
+
+    async def work():
+        starts.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(0.03)
+
+    async def run():
+        sup = Supervisor()
+        sup.add_job('w', work, interval=0.1)
+        sup.start()
+        await asyncio.sleep(0.45)
+        await sup.stop()
+        return sup
+
+    sup = asyncio.run(run())
+    assert len(starts) >= 4
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # each run starts one interval after the previous start, not interval + duration
+    assert all(0.08 < g < 0.12 for g in gaps)
+    assert sup.jobs['w'].overruns == 0
+
+
+def test_overrun_skips_slots_and_never_overlaps():
+    active = []
+    peak = []
+
+    async def slow():
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.25)
+        active.pop()
+
+    async def run():
+        sup = Supervisor()
+        sup.add_job('slow', slow, interval=0.1)
+        sup.start()
+        await asyncio.sleep(0.6)
+        await sup.stop()
+        return sup.jobs['slow']
+
+    job = asyncio.run(run())
+    assert max(peak) == 1
+    assert job.overruns >= 1
+    assert job.skipped_slots >= 2
+
+
+def test_failures_back_off_and_recover():
+    calls = []
+
+    async def flaky():
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) <= 2:
+            raise RuntimeError('boom')
+
+    async def run():
+        sup = Supervisor(backoff_base=0.05, backoff_max=1.0)
+        sup.add_job('flaky', flaky, interval=10)
+        sup.start()
+        await asyncio.sleep(0.3)
+        snap = sup.snapshot()[0]
+        await sup.stop()
+        return snap
+
+    snap = asyncio.run(run())
+    assert len(calls) == 3
+    assert calls[2] - calls[1] > calls[1] - calls[0]
+    assert snap['failures'] == 2
+    assert snap['consecutive_failures'] == 0
+    assert snap['last_error'] is None
+
+
+def test_stop_cancels_running_jobs():
+    cancelled = []
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        sup = Supervisor()
+        sup.add_job('hang', hang, interval=1)
+        sup.start()
+        await asyncio.sleep(0.05)
+        await sup.stop()
+        return sup
+
+    sup = asyncio.run(run())
+    assert cancelled == [1]
+    assert sup.jobs['hang'].task is None
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from telegram import Bot, Update, Message, Chat
+from telegram.ext import ApplicationBuilder, TypeHandler
+from app.update_processing import ChatOrderedApplication, UPDATE_STATS
+
+HANDLER_DELAY = 0.05
+
+
+def _update(i: int, chat_id: int) -> Update:
+    chat = Chat(id=chat_id, type='private')
+    return Update(update_id=i, message=Message(message_id=i, date=datetime.now(timezone.utc), chat=chat, text=str(i)))
+
+
+def _app(concurrency: int):
+    return (
+        ApplicationBuilder()
+        .token('123:TEST')
+        .updater(None)
+        .application_class(ChatOrderedApplication)
+        .concurrent_updates(concurrency)
+        .build()
+    )
+
+
+async def _drive(concurrency: int, chats: int = 10, per_chat: int = 3):
+    app = _app(concurrency)
+    seen = {}
+
+    async def handler(update, context):
+        await asyncio.sleep(HANDLER_DELAY)
+        seen.setdefault(update.effective_chat.id, []).append(update.update_id)
+
+    app.add_handler(TypeHandler(Update, handler))
+    await app.initialize()
+    await app.start()
+    t0 = time.perf_counter()
+    i = 0
+    for _ in range(per_chat):
+        for chat_id in range(1, chats + 1):
+            i += 1
+            await app.update_queue.put(_update(i, chat_id))
+    while sum(len(v) for v in seen.values()) < chats * per_chat:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - t0
+    await app.stop()
+    await app.shutdown()
+    return elapsed, seen
+
+
+def _no_network(monkeypatch):
+    async def no_network(self):
+        return None
+
+    monkeypatch.setattr(Bot, 'initialize', no_network)
+    monkeypatch.setattr(Bot, 'shutdown', no_network)
+
+
+def test_concurrent_updates_scale_and_keep_per_chat_order(monkeypatch):
+    _no_network(monkeypatch)
+    sequential, _ = asyncio.run(_drive(concurrency=1))
+    UPDATE_STATS['max_inflight'] = 0
+    concurrent, seen = asyncio.run(_drive(concurrency=16))
+
+    # 30 updates over 10 chats: sequential ~30 x delay, concurrent ~3 x delay (chat ordering)
+    assert concurrent * 3 < sequential
+    for chat_id, ids in seen.items():
+        assert ids == sorted(ids)
+    assert UPDATE_STATS['max_inflight'] <= 10
+    assert UPDATE_STATS['inflight'] == 0
+
+
+def test_flooding_chat_does_not_starve_other_chats(monkeypatch):
+    _no_network(monkeypatch)
+
+    async def run():
+        app = _app(4)
+        done = {}
+
+        async def handler(update, context):
+            if update.effective_chat.id == 1:
+                await asyncio.sleep(0.2)  # a slow /predict scrape, repeated
+            done[update.update_id] = time.perf_counter()
+
+        app.add_handler(TypeHandler(Update, handler))
+        await app.initialize()
+        await app.start()
+        t0 = time.perf_counter()
+        for i in range(1, 21):
+            await app.update_queue.put(_update(i, 1))
+        await app.update_queue.put(_update(100, 2))
+        while 100 not in done:
+            await asyncio.sleep(0.005)
+        latency = done[100] - t0
+        await app.stop()
+        await app.shutdown()
+        return latency
+
+    # chat 1 holds at most one slot, so chat 2 is served right away instead of after 20 x 0.2s
+    assert asyncio.run(run()) < 0.1